@@ -0,0 +1,314 @@
+"""
+Timing benchmarks for the critical duration pipeline.
+
+Every benchmark runs on synthetic hydrographs (``critical_duration.synthetic``),
+so the suite needs no DSS data. The DSS stages (``readDssData`` and the full
+``criticalDurationAnalysis``) write the synthetic records to a temporary DSS
+file and are skipped when pydsstools is not installed.
+
+Usage::
+
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --quick --compare bench.json
+
+Results are written as JSON: run metadata plus one entry per benchmark and
+size with the best and mean wall time over ``--repeat`` runs. ``--compare``
+matches entries against a previous results file and exits non-zero when any
+benchmark is slower than ``--threshold`` times its previous best.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from critical_duration.data_processing import (  # noqa: E402
+    batchVolumeWindowCalculations,
+    getCriticalDurationPlotData,
+    getVolumeWindowSummary,
+    volumeWindowCalculations,
+)
+from critical_duration.synthetic import syntheticHydrograph, syntheticScenarios  # noqa: E402
+
+HOURS_PER_YEAR = 24 * 365
+
+RECORD_LENGTHS = {
+    "10 days": 24 * 10,
+    "1 year": HOURS_PER_YEAR,
+    "10 years": 10 * HOURS_PER_YEAR,
+    "50 years": 50 * HOURS_PER_YEAR,
+}
+DURATION_SETS = {
+    "5 durations": [1, 2, 3, 5, 7],
+    "15 durations": list(range(1, 16)),
+    "30 durations": list(range(1, 31)),
+}
+SCENARIO_COUNTS = [1, 10, 100]
+
+QUICK_RECORD_LENGTHS = ["10 days", "1 year"]
+QUICK_DURATION_SETS = ["5 durations", "15 durations"]
+QUICK_SCENARIO_COUNTS = [1, 10]
+
+DEFAULT_DURATIONS = DURATION_SETS["5 durations"]
+SCENARIO_RECORD = "1 year"
+
+
+def timeit(func, repeat: int) -> dict:
+    """Runs ``func`` ``repeat`` times with stdout silenced and returns the timings."""
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    return {"seconds": min(times), "mean": sum(times) / len(times), "repeat": repeat}
+
+
+def inflowFrame(periods: int) -> pd.DataFrame:
+    record = syntheticHydrograph(periods)
+    return record[["inflow"]].rename(columns={"inflow": "flow"})
+
+
+def fits(periods: int, durations) -> bool:
+    return max(durations) * 24 < periods
+
+
+def benchVolumeWindows(lengths, durationSets, repeat):
+    for length in lengths:
+        periods = RECORD_LENGTHS[length]
+        df = inflowFrame(periods)
+        time_peak_stor = df.flow.idxmax()
+        for name in durationSets:
+            durations = DURATION_SETS[name]
+            if not fits(periods, durations):
+                continue
+            params = {"record": length, "durations": name}
+            yield "volumeWindowCalculations", params, timeit(
+                lambda: volumeWindowCalculations(df.copy(), time_peak_stor, durations),
+                repeat,
+            )
+
+
+def benchPlotData(lengths, repeat):
+    for length in lengths:
+        df = inflowFrame(RECORD_LENGTHS[length])
+        time_peak_stor = df.flow.idxmax()
+        yield "getCriticalDurationPlotData", {"record": length}, timeit(
+            lambda: getCriticalDurationPlotData(
+                df.copy(), time_peak_stor, DEFAULT_DURATIONS
+            ),
+            repeat,
+        )
+
+
+def benchPlot(lengths, repeat):
+    try:
+        from critical_duration.plotting import plot_volume_window
+    except ImportError:
+        return
+    for length in lengths:
+        df = inflowFrame(RECORD_LENGTHS[length])
+        plotData = getCriticalDurationPlotData(df, df.flow.idxmax(), DEFAULT_DURATIONS)
+        window = [str(df.index.min().date()), str(df.index.max().date())]
+        yield "plot_volume_window", {"record": length}, timeit(
+            lambda: plot_volume_window(plotData, window).to_dict(), repeat
+        )
+
+
+def benchScenarios(counts, repeat):
+    periods = RECORD_LENGTHS[SCENARIO_RECORD]
+    for count in counts:
+        records = syntheticScenarios(periods, np.linspace(0.1, 2.0, count))
+        index = records[0].index
+        flowIn = np.vstack([record.inflow.to_numpy() for record in records])
+        elev = np.vstack([record.elev.to_numpy() for record in records])
+        frames = [
+            (record[["inflow"]].rename(columns={"inflow": "flow"}), record.elev.idxmax())
+            for record in records
+        ]
+        params = {"record": SCENARIO_RECORD, "scenarios": count}
+
+        def perScenario():
+            for df, time_peak_stor in frames:
+                getVolumeWindowSummary(df, time_peak_stor, DEFAULT_DURATIONS)
+
+        yield "getVolumeWindowSummary per scenario", params, timeit(perScenario, repeat)
+        yield "batchVolumeWindowCalculations", params, timeit(
+            lambda: batchVolumeWindowCalculations(flowIn, elev, index, DEFAULT_DURATIONS),
+            repeat,
+        )
+
+
+def writeSyntheticDss(dss_file: str, records, reservoir: str = "SYNTHETIC"):
+    """
+    Writes synthetic records to ``dss_file`` and returns their pathname triples.
+    """
+    from pydsstools.core import TimeSeriesContainer
+    from pydsstools.heclib.dss import HecDss
+
+    paths = []
+    fid = HecDss.Open(dss_file)
+    try:
+        for i, record in enumerate(records, start=1):
+            fpart = f"C:{i:06d}|SYNTHETIC"
+            triple = []
+            for column, b, c, units, kind in [
+                ("inflow", f"{reservoir} INFLOW", "FLOW", "CFS", "PER-AVER"),
+                ("outflow", f"{reservoir} OUTFLOW", "FLOW", "CFS", "PER-AVER"),
+                ("elev", f"{reservoir}-POOL", "ELEV", "FT", "INST-VAL"),
+            ]:
+                tsc = TimeSeriesContainer()
+                tsc.pathname = f"//{b}/{c}//1HOUR/{fpart}/"
+                tsc.startDateTime = record.index[0].strftime("%d%b%Y %H:%M:%S").upper()
+                tsc.numberValues = len(record)
+                tsc.units = units
+                tsc.type = kind
+                tsc.interval = 1
+                tsc.values = record[column].to_numpy()
+                fid.put_ts(tsc)
+                triple.append(tsc.pathname)
+            paths.append(triple)
+    finally:
+        fid.close()
+    return paths
+
+
+def dssWindow(index: pd.DatetimeIndex):
+    return (index[0].strftime("%d%b%Y %H:%M"), index[-1].strftime("%d%b%Y %H:%M"))
+
+
+def benchDss(lengths, counts, repeat, workdir):
+    try:
+        import pydsstools  # noqa: F401
+    except ImportError:
+        print("pydsstools is not installed; skipping DSS benchmarks")
+        return
+    from critical_duration.data_processing import readDssData
+    from critical_duration.main import criticalDurationAnalysis
+
+    for length in lengths:
+        record = syntheticHydrograph(RECORD_LENGTHS[length])
+        dss_file = os.path.join(workdir, f"read_{RECORD_LENGTHS[length]}.dss")
+        (pathFlowIn, _, _), = writeSyntheticDss(dss_file, [record])
+        window = dssWindow(record.index)
+        yield "readDssData", {"record": length}, timeit(
+            lambda: readDssData(dss_file, pathFlowIn, "flow", window), repeat
+        )
+
+    periods = RECORD_LENGTHS[SCENARIO_RECORD]
+    for count in counts:
+        records = syntheticScenarios(periods, np.linspace(0.1, 2.0, count))
+        dss_file = os.path.join(workdir, f"scenarios_{count}.dss")
+        paths = writeSyntheticDss(dss_file, records)
+        window = dssWindow(records[0].index)
+
+        def analysis():
+            for sf, (pathFlowIn, pathFlowOut, pathElev) in zip(
+                np.linspace(0.1, 2.0, count), paths
+            ):
+                criticalDurationAnalysis(
+                    dss_file,
+                    2023,
+                    5500,
+                    pathFlowIn,
+                    pathFlowOut,
+                    pathElev,
+                    window,
+                    sf,
+                    "SYNTHETIC",
+                    workdir,
+                    DEFAULT_DURATIONS,
+                    render_plots="off",
+                )
+
+        params = {"record": SCENARIO_RECORD, "scenarios": count}
+        yield "criticalDurationAnalysis", params, timeit(analysis, repeat)
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": pd.Timestamp.now().isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def entryKey(entry: dict) -> str:
+    return json.dumps([entry["name"], entry["params"]], sort_keys=True)
+
+
+def compare(results: list, baselineFile: str, threshold: float) -> bool:
+    """Prints the change against a previous run; returns True if nothing regressed."""
+    with open(baselineFile) as f:
+        baseline = {entryKey(entry): entry for entry in json.load(f)["results"]}
+
+    ok = True
+    for entry in results:
+        previous = baseline.get(entryKey(entry))
+        if previous is None:
+            continue
+        ratio = entry["seconds"] / previous["seconds"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{entry['name']:40s} {json.dumps(entry['params']):50s} {ratio:6.2f}x{flag}")
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quick", action="store_true", help="small sizes only")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    lengths = QUICK_RECORD_LENGTHS if args.quick else list(RECORD_LENGTHS)
+    durationSets = QUICK_DURATION_SETS if args.quick else list(DURATION_SETS)
+    counts = QUICK_SCENARIO_COUNTS if args.quick else SCENARIO_COUNTS
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        suites = [
+            benchVolumeWindows(lengths, durationSets, args.repeat),
+            benchPlotData(lengths, args.repeat),
+            benchPlot(lengths, args.repeat),
+            benchScenarios(counts, args.repeat),
+            benchDss(lengths, counts, args.repeat, workdir),
+        ]
+        for suite in suites:
+            for name, params, timing in suite:
+                results.append({"name": name, "params": params, **timing})
+                print(f"{name:40s} {json.dumps(params):50s} {timing['seconds']:.4f} s")
+
+    with open(args.output, "w") as f:
+        json.dump({"metadata": metadata(), "results": results}, f, indent=2)
+
+    if args.compare:
+        return 0 if compare(results, args.compare, args.threshold) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
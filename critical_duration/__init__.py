@@ -1,12 +1,35 @@
-from .data_processing import getVolumeWindowData, readDssData, getCriticalDurationPlotData
-from .plotting import plot_volume_window
-
-from .main import criticalDurationAnalysis
-
-__all__ = [
-    "getVolumeWindowData",
-    "getCriticalDurationPlotData",
-    "readDssData",
-    "plot_volume_window",
-    "criticalDurationAnalysis",
-]
\ No newline at end of file
+import importlib
+
+# Public names and the submodules that define them. Submodules are imported on
+# first attribute access so that ``import critical_duration`` stays cheap and
+# compute-only code never loads Altair or pydsstools.
+_EXPORTS = {
+    "getVolumeWindowData": "data_processing",
+    "readDssData": "data_processing",
+    "getCriticalDurationPlotData": "data_processing",
+    "getVolumeWindowSummary": "data_processing",
+    "volumeWindowPlotData": "data_processing",
+    "volumeWindowChartData": "data_processing",
+    "batchVolumeWindowCalculations": "data_processing",
+    "getCriticalDurationCurve": "data_processing",
+    "channelExceedanceTimes": "data_processing",
+    "DssSession": "dss",
+    "plot_volume_window": "plotting",
+    "plot_volume_windows": "plotting",
+    "criticalDurationAnalysis": "main",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,288 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+
+def _evictOldest(entries: List[Tuple[float, int, List[str]]], max_bytes: int) -> None:
+    """
+    Deletes the oldest entries until the total size fits in ``max_bytes``.
+
+    Args:
+        entries (List[Tuple[float, int, List[str]]]): (last used time, size, files)
+            for every cache entry.
+        max_bytes (int): Upper bound on the total size.
+    """
+    total = sum(size for _, size, _ in entries)
+    for _, size, files in sorted(entries):
+        if total <= max_bytes:
+            break
+        for entryPath in files:
+            try:
+                os.remove(entryPath)
+            except FileNotFoundError:
+                pass
+        total -= size
+
+
+class SeriesCache:
+    """
+    On-disk cache of time series extracted from DSS files.
+
+    Each entry is a pair of memory-mappable ``.npy`` files (values and int64
+    epoch-nanosecond times) keyed on the DSS file's absolute path, modification
+    time and size, the record pathname and the read window. Editing the DSS file
+    therefore invalidates its entries automatically. The cache is bounded by
+    ``max_bytes``; the least recently used entries are evicted first.
+
+    Args:
+        directory (str, optional): Directory holding the cache entries.
+        max_bytes (int, optional): Upper bound on the total size of the cache.
+        enabled (bool, optional): When False, ``get`` always misses and ``put`` is a
+            no-op, so reads go straight to the DSS file.
+    """
+
+    def __init__(
+        self,
+        directory: str = ".critical_duration_cache/series",
+        max_bytes: int = 2 * 1024**3,
+        enabled: bool = True,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+    def key(self, dss_file: str, path: str, window: Tuple[str, str] = None) -> str:
+        """
+        Returns the cache key of a record read.
+
+        Args:
+            dss_file (str): Path to the DSS file.
+            path (str): DSS path in the format /A/B/C/D/E/F/.
+            window (Tuple[str, str], optional): Time window for data extraction (start, end).
+
+        Returns:
+            str: Hex digest identifying the file version, record and window.
+        """
+        stat = os.stat(dss_file)
+        window = None if window is None else tuple(part.strip() for part in window)
+        token = repr(
+            (os.path.abspath(dss_file), stat.st_mtime_ns, stat.st_size, path, window)
+        )
+        return hashlib.sha1(token.encode()).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return (
+            os.path.join(self.directory, f"{key}.values.npy"),
+            os.path.join(self.directory, f"{key}.times.npy"),
+        )
+
+    def get(
+        self,
+        dss_file: str,
+        path: str,
+        variable: str,
+        window: Tuple[str, str] = None,
+    ) -> Optional[pd.DataFrame]:
+        """
+        Returns a cached series, or None on a miss.
+
+        Values are memory-mapped read-only rather than loaded.
+
+        Args:
+            dss_file (str): Path to the DSS file.
+            path (str): DSS path in the format /A/B/C/D/E/F/.
+            variable (str): Column name for the data (e.g., 'flow', 'elev').
+            window (Tuple[str, str], optional): Time window for data extraction (start, end).
+
+        Returns:
+            Optional[pd.DataFrame]: DataFrame indexed by 'date' with a single
+            ``variable`` column, as returned by ``readDssData``.
+        """
+        if not self.enabled:
+            return None
+        valuesPath, timesPath = self._paths(self.key(dss_file, path, window))
+        try:
+            values = np.load(valuesPath, mmap_mode="r")
+            times = np.load(timesPath)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        os.utime(valuesPath)  # mark as recently used
+        idx = pd.DatetimeIndex(times.view("datetime64[ns]"), name="date")
+        return pd.DataFrame(index=idx, data=values, columns=[variable])
+
+    def put(
+        self,
+        dss_file: str,
+        path: str,
+        window: Tuple[str, str],
+        df: pd.DataFrame,
+    ) -> None:
+        """
+        Stores a series read from ``dss_file`` and evicts old entries if needed.
+
+        Args:
+            dss_file (str): Path to the DSS file.
+            path (str): DSS path in the format /A/B/C/D/E/F/.
+            window (Tuple[str, str]): Time window the series was read with.
+            df (pd.DataFrame): Single-column DataFrame indexed by time.
+        """
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        valuesPath, timesPath = self._paths(self.key(dss_file, path, window))
+        times = pd.DatetimeIndex(df.index).as_unit("ns").asi8
+        values = df.iloc[:, 0].to_numpy()
+        # Each file appears complete or not at all, so another worker sharing the
+        # cache never reads a partial entry. The values go last: an entry only
+        # counts once its values file exists.
+        for entryPath, data in [(timesPath, times), (valuesPath, values)]:
+            tmpPath = f"{entryPath}.{os.getpid()}.tmp"
+            with open(tmpPath, "wb") as f:
+                np.save(f, data)
+            os.replace(tmpPath, entryPath)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Removes least recently used entries until the cache fits in ``max_bytes``.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".values.npy"):
+                continue
+            valuesPath, timesPath = self._paths(name[: -len(".values.npy")])
+            try:
+                stat = os.stat(valuesPath)
+                size = stat.st_size + os.path.getsize(timesPath)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, size, [valuesPath, timesPath]))
+        _evictOldest(entries, self.max_bytes)
+
+    def clear(self) -> None:
+        """Deletes every cache entry."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ResultCache:
+    """
+    On-disk memo of per-duration volume-window results.
+
+    Entries are keyed on a content hash of the inflow series (values and time
+    index) and the time of peak storage; each entry holds the results of every
+    duration computed so far for that hydrograph. Adding a duration or scale
+    factor to a study therefore only computes the missing (scenario, duration)
+    cells. The cache is bounded by ``max_bytes``; the least recently used
+    entries are evicted first.
+
+    Args:
+        directory (str, optional): Directory holding the cache entries.
+        max_bytes (int, optional): Upper bound on the total size of the cache.
+        enabled (bool, optional): When False, ``get`` always misses and ``update`` is a
+            no-op.
+    """
+
+    def __init__(
+        self,
+        directory: str = ".critical_duration_cache/results",
+        max_bytes: int = 256 * 1024**2,
+        enabled: bool = True,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+    def key(
+        self, flow: np.ndarray, times: np.ndarray, time_peak_stor: pd.Timestamp
+    ) -> str:
+        """
+        Returns the content hash identifying a hydrograph and its peak storage time.
+
+        Args:
+            flow (np.ndarray): Inflow values.
+            times (np.ndarray): ``datetime64`` time index of ``flow``.
+            time_peak_stor (pd.Timestamp): Timestamp of the peak storage event.
+
+        Returns:
+            str: Hex digest of the inputs.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(np.ascontiguousarray(flow, dtype=np.float64).tobytes())
+        digest.update(np.ascontiguousarray(times, dtype="datetime64[ns]").tobytes())
+        digest.update(str(pd.Timestamp(time_peak_stor)).encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Dict[int, dict]:
+        """
+        Returns the cached results of a hydrograph, keyed by duration in days.
+
+        Args:
+            key (str): Key returned by ``key``.
+
+        Returns:
+            Dict[int, dict]: Results with 'window_start' and 'window_end' (epoch
+            nanoseconds), 'max_flow' and 'ratio'. Empty on a miss.
+        """
+        if not self.enabled:
+            return {}
+        entryPath = self._path(key)
+        try:
+            with open(entryPath) as f:
+                results = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+        os.utime(entryPath)  # mark as recently used
+        return {int(n_day): result for n_day, result in results.items()}
+
+    def update(self, key: str, results: Dict[int, dict]) -> None:
+        """
+        Adds duration results to a hydrograph's entry and evicts old entries if needed.
+
+        Args:
+            key (str): Key returned by ``key``.
+            results (Dict[int, dict]): Results keyed by duration in days.
+        """
+        if not self.enabled or not results:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        merged = self.get(key)
+        merged.update(results)
+        entryPath = self._path(key)
+        tmpPath = f"{entryPath}.{os.getpid()}.tmp"
+        with open(tmpPath, "w") as f:
+            json.dump({str(n_day): result for n_day, result in merged.items()}, f)
+        os.replace(tmpPath, entryPath)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Removes least recently used entries until the cache fits in ``max_bytes``.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            entryPath = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(entryPath)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, [entryPath]))
+        _evictOldest(entries, self.max_bytes)
+
+    def clear(self) -> None:
+        """Deletes every cache entry."""
+        shutil.rmtree(self.directory, ignore_errors=True)
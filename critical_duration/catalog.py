@@ -0,0 +1,167 @@
+import os
+import re
+import pandas as pd
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from .dss import DssSession
+
+# F-part of the scenario records, e.g. "C:000010|EXISTING C:2023_SDI D:RESSIM-FRA SHIFT"
+_F_PART = re.compile(r"^C:(?P<collection_id>\d+)\|(?P<alternative>.*)$")
+
+_CATALOG_COLUMNS = [
+    "pathname",
+    "location",
+    "variable",
+    "interval",
+    "collection_id",
+    "alternative",
+]
+
+_catalogs: Dict[str, Tuple[float, int, pd.DataFrame]] = {}
+
+
+class ScenarioPaths(NamedTuple):
+    """Inflow, outflow and pool elevation pathnames for one collection member."""
+
+    collection_id: int
+    alternative: str
+    pathFlowIn: str
+    pathFlowOut: str
+    pathElev: str
+
+
+def parseFPart(fpart: str) -> Optional[Tuple[int, str]]:
+    """
+    Splits a collection F-part into its collection ID and alternative.
+
+    Args:
+        fpart (str): F-part such as ``C:000010|EXISTING C:2023_SDI D:RESSIM-FRA SHIFT``.
+
+    Returns:
+        Optional[Tuple[int, str]]: (collection ID, alternative), or None if the F-part
+        is not a collection member.
+    """
+    match = _F_PART.match(fpart)
+    if match is None:
+        return None
+    return int(match["collection_id"]), match["alternative"]
+
+
+def _indexPathnames(pathnames: List[str]) -> pd.DataFrame:
+    """
+    Parses catalog pathnames into one row per collection record.
+
+    The D-part (block date) is cleared so each record appears once, in the form
+    ``readDssData`` expects.
+    """
+    rows = {}
+    for pathname in pathnames:
+        parts = pathname.split("/")
+        if len(parts) != 8:
+            continue
+        parsed = parseFPart(parts[6])
+        if parsed is None:
+            continue
+        parts[4] = ""
+        record = "/".join(parts)
+        rows[record] = (record, parts[2], parts[3], parts[5], *parsed)
+
+    return pd.DataFrame(list(rows.values()), columns=_CATALOG_COLUMNS)
+
+
+def getCatalogIndex(dss_file: str, session: DssSession = None) -> pd.DataFrame:
+    """
+    Returns the parsed pathname catalog of a DSS file.
+
+    The catalog is read once per file and cached together with the file's
+    modification time and size; it is re-read only when the file changes.
+
+    Args:
+        dss_file (str): Path to the DSS file.
+        session (DssSession, optional): Open session to read the catalog from.
+
+    Returns:
+        pd.DataFrame: One row per collection record with columns 'pathname',
+        'location' (B-part), 'variable' (C-part), 'interval' (E-part),
+        'collection_id' and 'alternative'.
+
+    Raises:
+        AssertionError: If the DSS file does not exist.
+    """
+    assert os.path.exists(dss_file), f"Cannot locate DSS file {dss_file}"
+    key = os.path.abspath(dss_file)
+    stat = os.stat(dss_file)
+    cached = _catalogs.get(key)
+    if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+        return cached[2]
+
+    if session is None:
+        with DssSession(dss_file) as session:
+            pathnames = session.pathnames()
+    else:
+        pathnames = session.pathnames()
+
+    catalog = _indexPathnames(pathnames)
+    _catalogs[key] = (stat.st_mtime, stat.st_size, catalog)
+    return catalog
+
+
+def findScenarioPaths(
+    dss_file: str,
+    inflowLocation: str,
+    outflowLocation: str,
+    elevLocation: str,
+    alternative: str = None,
+    interval: str = None,
+    session: DssSession = None,
+) -> List[ScenarioPaths]:
+    """
+    Groups catalog records into inflow/outflow/elevation triples per scenario.
+
+    Only scenarios with all three records present are returned, so missing
+    collection members are skipped instead of failing on read.
+
+    Args:
+        dss_file (str): Path to the DSS file.
+        inflowLocation (str): B-part of the reservoir inflow records.
+        outflowLocation (str): B-part of the reservoir outflow records.
+        elevLocation (str): B-part of the pool elevation records.
+        alternative (str, optional): Only keep records of this alternative (the F-part
+            text after the collection ID).
+        interval (str, optional): Only keep records with this E-part (e.g. '1HOUR').
+        session (DssSession, optional): Open session to read the catalog from.
+
+    Returns:
+        List[ScenarioPaths]: Scenarios sorted by alternative and collection ID.
+    """
+    catalog = getCatalogIndex(dss_file, session)
+    if alternative is not None:
+        catalog = catalog.loc[catalog.alternative == alternative]
+    if interval is not None:
+        catalog = catalog.loc[catalog.interval == interval]
+
+    roles = {
+        (inflowLocation, "FLOW"): "pathFlowIn",
+        (outflowLocation, "FLOW"): "pathFlowOut",
+        (elevLocation, "ELEV"): "pathElev",
+    }
+    role = pd.Series(
+        [roles.get(key) for key in zip(catalog.location, catalog.variable.str.upper())],
+        index=catalog.index,
+        dtype=object,
+    )
+    catalog = catalog.assign(role=role).dropna(subset=["role"])
+
+    triples = catalog.pivot_table(
+        index=["alternative", "collection_id"],
+        columns="role",
+        values="pathname",
+        aggfunc="first",
+    )
+    triples = triples.reindex(columns=list(roles.values())).dropna()
+
+    return [
+        ScenarioPaths(
+            int(collection_id), alt, row.pathFlowIn, row.pathFlowOut, row.pathElev
+        )
+        for (alt, collection_id), row in triples.sort_index().iterrows()
+    ]
@@ -0,0 +1,139 @@
+import argparse
+import logging
+import os
+import sys
+from .cache import ResultCache, SeriesCache
+from .instrumentation import enableTracing
+from .results import ResultStore
+from .service import DEFAULT_PORT, serve
+from .study import loadStudy, runStudy, studyScenarios
+
+
+def main(argv=None) -> int:
+    """
+    Command line entry point (``critical-duration``).
+
+    Usage::
+
+        critical-duration run studies/terminus_2023.toml --workers 8
+        critical-duration scenarios studies/terminus_2023.toml
+        critical-duration query outputs/critical_duration.sqlite --reservoir TERMINUS --duration 3
+        critical-duration serve --port 8750
+
+    ``run`` resumes an interrupted run unless ``--restart`` is given, and reads
+    records through a series cache (``--cache-dir``, ``--no-cache``) so reruns do
+    not decode them from the DSS file again. It exits with status 1 if any
+    scenario failed.
+    """
+    parser = argparse.ArgumentParser(
+        prog="critical-duration", description="Critical duration analysis"
+    )
+    parser.add_argument("--verbose", "-v", action="store_true", help="debug logging")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run every scenario of a study")
+    run.add_argument("study", help="TOML or YAML study definition")
+    run.add_argument("--workers", type=int, help="worker processes (default: CPUs)")
+    run.add_argument(
+        "--render-plots",
+        choices=["off", "inline", "deferred", "faceted"],
+        default="inline",
+    )
+    run.add_argument("--compact", action="store_true", help="one row per duration")
+    run.add_argument(
+        "--restart", action="store_true", help="discard earlier results and checkpoints"
+    )
+    run.add_argument(
+        "--prefetch",
+        type=int,
+        default=2,
+        help="scenarios read ahead on a background thread with --workers 1 (0: off)",
+    )
+    run.add_argument(
+        "--cache-dir",
+        default=".critical_duration_cache/series",
+        help="series cache directory for DSS reads",
+    )
+    run.add_argument(
+        "--cache-max-gb", type=float, default=2.0, help="size bound of the series cache"
+    )
+    run.add_argument(
+        "--no-cache", action="store_true", help="read every record from the DSS file"
+    )
+    run.add_argument(
+        "--result-cache-dir",
+        help="per-duration result cache directory, so added durations reuse the others",
+    )
+    run.add_argument("--trace", help="write per-stage timings to this JSON-lines file")
+
+    scenarios = commands.add_parser("scenarios", help="list the scenarios of a study")
+    scenarios.add_argument("study", help="TOML or YAML study definition")
+
+    query = commands.add_parser("query", help="print stored results")
+    query.add_argument("store", help="SQLite result store")
+    query.add_argument("--reservoir", nargs="+")
+    query.add_argument("--year", nargs="+", type=int)
+    query.add_argument("--scale-factor", nargs="+", type=float)
+    query.add_argument("--duration", nargs="+", type=int)
+    query.add_argument("--output", help="write a CSV file instead of printing")
+
+    service = commands.add_parser("serve", help="answer analysis jobs on localhost")
+    service.add_argument("--port", type=int, default=DEFAULT_PORT)
+    service.add_argument("--cache-dir", help="series cache directory for DSS reads")
+    service.add_argument("--result-cache-dir", help="per-duration result cache directory")
+    service.add_argument(
+        "--output-directory",
+        default="outputs",
+        help="directory that job outputs are written below",
+    )
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s"
+    )
+
+    if args.command == "serve":
+        serve(args.port, args.cache_dir, args.result_cache_dir, args.output_directory)
+        return 0
+
+    if args.command == "query":
+        if not os.path.exists(args.store):
+            parser.error(f"no result store at {args.store}")
+        with ResultStore(args.store) as store:
+            df = store.query(args.reservoir, args.year, args.scale_factor, args.duration)
+        if args.output:
+            df.to_csv(args.output, index=False)
+        else:
+            print(df.to_string(index=False))
+        return 0
+
+    study = loadStudy(args.study)
+
+    if args.command == "scenarios":
+        for scenario in studyScenarios(study):
+            print(f"{scenario.scale_factor:.2f}  {scenario.pathFlowIn}")
+        return 0
+
+    if args.trace:
+        enableTracing(args.trace, log=False)
+    cache = SeriesCache(
+        args.cache_dir, int(args.cache_max_gb * 1024**3), enabled=not args.no_cache
+    )
+    result_cache = ResultCache(args.result_cache_dir) if args.result_cache_dir else None
+    result = runStudy(
+        study,
+        workers=args.workers,
+        render_plots=args.render_plots,
+        compact=args.compact,
+        restart=args.restart,
+        prefetch=args.prefetch,
+        cache=cache,
+        result_cache=result_cache,
+    )
+    for failure in result.failures:
+        print(f"Scale factor {failure.scenario.scale_factor:.2f} failed:\n{failure.error}")
+    return 1 if result.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
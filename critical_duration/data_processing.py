@@ -1,13 +1,21 @@
+import logging
 import pandas as pd
 import numpy as np
-from pydsstools.heclib.dss import HecDss
 import os
 from collections import namedtuple
-from typing import Tuple, NamedTuple, List
+from typing import Dict, Tuple, NamedTuple, List, Optional
+from .cache import ResultCache, SeriesCache
+from .dss import DssSession
+from .instrumentation import stage
+
+logger = logging.getLogger(__name__)
 
 
 def getCriticalDurationPlotData(
-    df: pd.DataFrame, time_peak_stor: pd.Timestamp, durations: List = [1, 2, 3, 5, 7]
+    df: pd.DataFrame,
+    time_peak_stor: pd.Timestamp,
+    durations: List = [1, 2, 3, 5, 7],
+    cache: ResultCache = None,
 ) -> pd.DataFrame:
     """
     Calculates n-day rolling volumes and normalizes them based on event windows.
@@ -16,6 +24,8 @@ def getCriticalDurationPlotData(
         df (pd.DataFrame): DataFrame containing flow data with a 'flow' column.
         time_peak_stor (pd.Timestamp): Timestamp of the peak storage event.
         durations (List[int]): List of durations (in days) for rolling volume calculations.
+        cache (ResultCache, optional): Memo of per-duration results; see
+            ``volumeWindowCalculations``.
 
     Returns:
         pd.DataFrame: Transformed DataFrame with n-day rolling volumes, normalized values,
@@ -30,21 +40,549 @@ def getCriticalDurationPlotData(
         - Normalized volumes are calculated as the ratio of event volume to n-day volume.
         - Adds new columns for each n-day metric and prepares the DataFrame for visualization.
     """
-    df, max_vols = volumeWindowCalculations(df, time_peak_stor, durations)
+    summary = getVolumeWindowSummary(df, time_peak_stor, durations, cache)
+    return volumeWindowPlotData(df, summary)
+
+
+def _metricName(n_day: int) -> str:
+    return f"{n_day}".zfill(3) + "-day"
+
+
+def getVolumeWindowSummary(
+    df: pd.DataFrame,
+    time_peak_stor: pd.Timestamp,
+    durations: List[int] = [1, 2, 3, 5, 7],
+    cache: ResultCache = None,
+) -> pd.DataFrame:
+    """
+    Computes the volume window of each duration as one row of scalars.
+
+    This is the compact counterpart of ``getCriticalDurationPlotData``: it stores
+    only the window bounds, peak n-day flow and ratio per duration rather than a
+    long frame with one row per time step and metric. Use
+    ``volumeWindowPlotData`` to expand it for plotting.
+
+    Windows are measured in time rather than rows, so records at any regular
+    interval (15-minute, hourly, daily) and irregular records are handled
+    without resampling; volumes integrate flow over each value's time step.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing flow data with a 'flow' column. The
+            record interval in seconds is taken from ``df.attrs["interval"]`` when
+            present (``DssSession.read`` sets it from the E-part) and otherwise
+            inferred from the index.
+        time_peak_stor (pd.Timestamp): Timestamp of the peak storage event.
+        durations (List[int]): List of durations (in days) for rolling volume calculations.
+        cache (ResultCache, optional): Memo of per-duration results keyed on the
+            content of ``df.flow``; only durations missing from it are computed.
+
+    Returns:
+        pd.DataFrame: Indexed by integer 'duration' (days), with columns
+        'window_start', 'window_end', 'max_flow' (peak n-day mean flow, cfs) and
+        'ratio' (volume-window ratio).
+
+    Raises:
+        ValueError: If the record is shorter than one of the requested durations.
+    """
+    flow = df.flow.to_numpy()
+    times = df.index.values
+
+    windows = {}
+    if cache is not None:
+        key = cache.key(flow, times, time_peak_stor)
+        windows = cache.get(key)
+    missing = [n_day for n_day in durations if n_day not in windows]
+    if missing:
+        with stage("rolling_calc", durations=len(missing)) as s:
+            computed = _volumeWindowResults(
+                flow, times, time_peak_stor, missing, df.attrs.get("interval")
+            )
+            s.rows = len(flow)
+        windows.update(computed)
+        if cache is not None:
+            cache.update(key, computed)
+
+    return _summaryFrame(windows, durations)
+
+
+def _summaryFrame(windows: Dict[int, dict], durations: List[int]) -> pd.DataFrame:
+    """
+    Builds the ``getVolumeWindowSummary`` frame from per-duration results as
+    returned by ``_volumeWindowResults``.
+    """
+    summary = pd.DataFrame(
+        [windows[n_day] for n_day in durations],
+        index=pd.Index(durations, name="duration", dtype=np.int64),
+        columns=["window_start", "window_end", "max_flow", "ratio"],
+    )
+    for col in ["window_start", "window_end"]:
+        summary[col] = pd.to_datetime(summary[col].to_numpy(np.int64), unit="ns")
+    return summary
+
+
+def volumeWindowPlotData(df: pd.DataFrame, summary: pd.DataFrame) -> pd.DataFrame:
+    """
+    Expands a volume window summary into the long format used for plotting.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing flow data with a 'flow' column.
+        summary (pd.DataFrame): Output of ``getVolumeWindowSummary`` for ``df``.
+
+    Returns:
+        pd.DataFrame: Long DataFrame with columns 'date', 'metric' ('flow' or
+        e.g. '003-day'), 'flow' and 'text' (the ratio, on n-day rows only), with one
+        n-day row per time step inside each window. Rows are ordered by date and
+        then metric, as produced by stacking the wide frame.
+    """
+    times = df.index.values
+    flow = df.flow.to_numpy(dtype=np.float64)
+    keep = ~np.isnan(flow)
+
+    dates = [times[keep]]
+    metrics = [np.full(keep.sum(), "flow", dtype=object)]
+    values = [flow[keep]]
+    texts = [np.full(keep.sum(), np.nan)]
+    order = [np.zeros(keep.sum(), dtype=np.int64)]
+    positions = [np.flatnonzero(keep)]
+
+    for code, (n_day, row) in enumerate(summary.iterrows(), start=1):
+        lo = np.searchsorted(times, np.datetime64(row.window_start), side="left")
+        hi = np.searchsorted(times, np.datetime64(row.window_end), side="right")
+        dates.append(times[lo:hi])
+        metrics.append(np.full(hi - lo, _metricName(n_day), dtype=object))
+        values.append(np.full(hi - lo, row.max_flow))
+        texts.append(np.full(hi - lo, row.ratio))
+        order.append(np.full(hi - lo, code, dtype=np.int64))
+        positions.append(np.arange(lo, hi))
+
+    sort = np.lexsort((np.concatenate(order), np.concatenate(positions)))
+    return pd.DataFrame(
+        {
+            "date": np.concatenate(dates)[sort],
+            "metric": np.concatenate(metrics)[sort],
+            "flow": np.concatenate(values)[sort],
+            "text": np.concatenate(texts)[sort],
+        }
+    )
 
-    df = df.stack()
-    df.index.names = ["date", "metric"]
-    df.name = "flow"
-    df = df.reset_index()
-    df.loc[df.metric != "flow", "text"] = df.loc[df.metric != "flow", "metric"].map(
-        max_vols
+
+def _minMaxDecimate(values: np.ndarray, buckets: int) -> np.ndarray:
+    """
+    Positions of the first minimum and maximum of ``values`` in each bucket.
+
+    The non-missing values are split into ``buckets`` buckets of equal count
+    (equal time spans for a regular record), so a line through the kept points
+    has the same envelope as the full trace at one bucket per pixel. Series with
+    at most two values per bucket are kept whole.
+
+    Returns:
+        np.ndarray: Sorted positions in ``values``, at most ``2 * buckets``.
+    """
+    valid = np.flatnonzero(~np.isnan(values))
+    n = len(valid)
+    if n <= 2 * buckets:
+        return valid
+    kept = values[valid]
+    starts = np.arange(buckets) * n // buckets
+    bucket = np.repeat(np.arange(buckets), np.diff(np.append(starts, n)))
+    positions = np.arange(n)
+    highs = np.maximum.reduceat(kept, starts)
+    lows = np.minimum.reduceat(kept, starts)
+    firstHigh = np.minimum.reduceat(np.where(kept == highs[bucket], positions, n), starts)
+    firstLow = np.minimum.reduceat(np.where(kept == lows[bucket], positions, n), starts)
+    return valid[np.union1d(firstHigh, firstLow)]
+
+
+def _chartFrame(
+    dates: np.ndarray,
+    flow: np.ndarray,
+    metrics: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    max_flow: np.ndarray,
+    ratios: np.ndarray,
+) -> pd.DataFrame:
+    """Flow trace rows followed by a start and an end row per volume window."""
+    labels = np.column_stack([np.full(len(metrics), np.nan), ratios]).ravel()
+    return pd.DataFrame(
+        {
+            "date": np.concatenate([dates, np.column_stack([starts, ends]).ravel()]),
+            "metric": np.concatenate(
+                [np.full(len(dates), "flow", dtype=object), np.repeat(metrics, 2)]
+            ).astype(object),
+            "flow": np.concatenate([flow, np.repeat(max_flow, 2)]),
+            "text": np.concatenate([np.full(len(dates), np.nan), labels]),
+        }
+    )
+
+
+def volumeWindowChartData(
+    df: pd.DataFrame, summary: pd.DataFrame, buckets: int = 1000
+) -> pd.DataFrame:
+    """
+    Builds the compact chart data of one scenario from its volume window summary.
+
+    The flow trace is min/max decimated to at most ``2 * buckets`` points (see
+    ``compactPlotData``) and each volume window is a two-point segment, so the
+    size of the chart does not grow with the record length.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing flow data with a 'flow' column.
+        summary (pd.DataFrame): Output of ``getVolumeWindowSummary`` for ``df``.
+        buckets (int, optional): Number of buckets, about one per horizontal pixel.
+
+    Returns:
+        pd.DataFrame: Columns 'date', 'metric', 'flow' and 'text' as
+        ``volumeWindowPlotData``. Flow rows come first, then a start and an end
+        row per duration; only the end row, where the label is drawn, has a 'text'.
+    """
+    times = df.index.values
+    flow = df.flow.to_numpy(dtype=np.float64)
+    keep = _minMaxDecimate(flow, buckets)
+    return _chartFrame(
+        times[keep],
+        flow[keep],
+        np.array([_metricName(n_day) for n_day in summary.index], dtype=object),
+        summary.window_start.to_numpy(dtype=times.dtype),
+        summary.window_end.to_numpy(dtype=times.dtype),
+        summary.max_flow.to_numpy(dtype=np.float64),
+        summary.ratio.to_numpy(dtype=np.float64),
+    )
+
+
+def compactPlotData(plotData: pd.DataFrame, buckets: int = 1000) -> pd.DataFrame:
+    """
+    Reduces long plot data to the compact chart data of ``volumeWindowChartData``.
+
+    The flow trace keeps the first minimum and maximum of each of ``buckets``
+    buckets, and the n-day rows of each metric become two points at the first
+    and last date of its window. Compacting chart data again returns it
+    unchanged, so either form can be passed to the plotting functions.
+
+    Args:
+        plotData (pd.DataFrame): Output of ``volumeWindowPlotData`` or
+            ``volumeWindowChartData``.
+        buckets (int, optional): Number of buckets, about one per horizontal pixel.
+
+    Returns:
+        pd.DataFrame: Compact chart data.
+    """
+    isFlow = (plotData.metric == "flow").to_numpy()
+    flowRows = plotData.loc[isFlow]
+    keep = _minMaxDecimate(flowRows.flow.to_numpy(dtype=np.float64), buckets)
+    windows = plotData.loc[~isFlow].groupby("metric", sort=True).agg(
+        start=("date", "min"), end=("date", "max"), flow=("flow", "max"), text=("text", "max")
+    )
+    return _chartFrame(
+        flowRows.date.to_numpy()[keep],
+        flowRows.flow.to_numpy(dtype=np.float64)[keep],
+        windows.index.to_numpy(dtype=object),
+        windows.start.to_numpy(),
+        windows.end.to_numpy(),
+        windows.flow.to_numpy(dtype=np.float64),
+        windows.text.to_numpy(dtype=np.float64),
     )
 
-    return df
+
+class BatchVolumeWindows(NamedTuple):
+    """
+    Volume-window results for a batch of scenarios sharing one time index.
+
+    Arrays indexed ``[scenario, duration]`` follow the row order of the input
+    array and the order of ``durations``. Scenarios without a complete n-day
+    window hold NaN / NaT. When outflow and channel capacities are given,
+    ``time_ds_channel_exceed`` is indexed ``[scenario, capacity]``.
+    """
+
+    durations: np.ndarray
+    ratios: np.ndarray
+    max_flow: np.ndarray
+    window_start: np.ndarray
+    window_end: np.ndarray
+    time_peak_stor: np.ndarray
+    capacities: Optional[np.ndarray] = None
+    time_ds_channel_exceed: Optional[np.ndarray] = None
+
+
+class CriticalDurationCurve(NamedTuple):
+    """
+    Volume-window results for every duration on a fine grid.
+
+    ``curve`` is indexed by a TimedeltaIndex named 'duration' and has the same
+    columns as ``getVolumeWindowSummary``. ``critical_duration`` is the duration
+    whose ratio is closest to 1, i.e. whose maximum-volume window best matches
+    the inflow up to peak storage (NaT if no duration fits in the record).
+    """
+
+    curve: pd.DataFrame
+    critical_duration: pd.Timedelta
+
+
+# Cap on (window lengths x time steps) evaluated at once by ``_curveWindows``
+_CURVE_BLOCK_ELEMENTS = 1 << 22
+
+
+def _prefixSum(values: np.ndarray) -> np.ndarray:
+    """
+    Cumulative sum along the last axis with a leading zero, so the sum of
+    ``values[..., i:j]`` is ``cs[..., j] - cs[..., i]``.
+
+    Args:
+        values (np.ndarray): Array to accumulate (one row per scenario).
+
+    Returns:
+        np.ndarray: Array with the last axis one element longer than ``values``.
+    """
+    shape = values.shape[:-1] + (values.shape[-1] + 1,)
+    cs = np.zeros(shape, dtype=np.result_type(values.dtype, np.float64))
+    np.cumsum(values, axis=-1, out=cs[..., 1:])
+    return cs
+
+
+def _rollingWindowMeans(
+    cs: np.ndarray, nanCount: np.ndarray, window: int
+) -> np.ndarray:
+    """
+    Left-closed rolling means of ``window`` rows computed from prefix sums.
+
+    Element ``k`` is the mean of rows ``k .. k + window - 1``, i.e. the value pandas
+    ``rolling(window, closed="left").mean()`` reports at row ``k + window``. Windows
+    containing missing values are NaN.
+
+    Args:
+        cs (np.ndarray): Prefix sum of the flow series with missing values zeroed.
+        nanCount (np.ndarray): Prefix count of missing values in the flow series.
+        window (int): Window length in rows.
+
+    Returns:
+        np.ndarray: Rolling means for every complete window in the series.
+    """
+    n = cs.shape[-1] - 1
+    # A window longer than the record has no complete position; without the clamp
+    # a negative ``n - window`` would slice from the end
+    count = max(n - window, 0)
+    means = (cs[..., window : window + count] - cs[..., :count]) / window
+    means[(nanCount[..., window : window + count] - nanCount[..., :count]) > 0] = np.nan
+    return means
+
+
+def _timeSteps(times: np.ndarray, interval: float = None) -> np.ndarray:
+    """
+    Seconds represented by each value, from its timestamp to the next one.
+
+    Args:
+        times (np.ndarray): Sorted ``datetime64`` time index.
+        interval (float, optional): Record interval in seconds (e.g. from the DSS
+            E-part), used for the last value. Defaults to the step before it.
+
+    Returns:
+        np.ndarray: Float seconds, one per time.
+    """
+    steps = np.diff(times).astype("timedelta64[ns]").astype(np.int64) / 1e9
+    if interval is None:
+        interval = steps[-1] if len(steps) else np.nan
+    return np.append(steps, float(interval))
+
+
+def _regularStep(steps: np.ndarray) -> Optional[float]:
+    """
+    Returns the time step in seconds if every step is equal and divides a day,
+    so that each n-day window is a whole number of rows; None otherwise.
+    """
+    if not len(steps) or not (steps == steps[0]).all():
+        return None
+    step = float(steps[0])
+    return step if step > 0 and 86400 % step == 0 else None
+
+
+def _flowPrefixSums(
+    flow: np.ndarray, steps: np.ndarray = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Prefix sums of flow (missing values zeroed) and of the missing-value count.
+
+    Args:
+        flow (np.ndarray): Flow array of shape (scenarios, time).
+        steps (np.ndarray, optional): Seconds per value for series without a regular
+            step. The flow prefix sum then accumulates volume (flow x seconds).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Flow prefix sum and missing-count prefix sum.
+    """
+    flow = np.asarray(flow, dtype=np.float64)
+    missing = np.isnan(flow)
+    flow = np.where(missing, 0.0, flow)
+    if steps is not None:
+        flow *= steps
+    return _prefixSum(flow), _prefixSum(missing)
+
+
+def _durationWindows(
+    cs: np.ndarray,
+    nanCount: np.ndarray,
+    times: np.ndarray,
+    peakPos: np.ndarray,
+    n_day: int,
+    step: Optional[float],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Locates the maximum n-day window and its volume-window ratio for every row.
+
+    A window ending at row ``j`` covers the values timestamped in
+    ``[times[j] - n_day, times[j])``. With a regular ``step`` that is a fixed number
+    of rows; otherwise the window start of every row is found with
+    ``searchsorted`` and the mean is the volume over the covered time span.
+
+    Args:
+        cs (np.ndarray): Flow prefix sums, shape (scenarios, time + 1). Volume prefix
+            sums (see ``_flowPrefixSums``) when ``step`` is None.
+        nanCount (np.ndarray): Missing-count prefix sums, same shape as ``cs``.
+        times (np.ndarray): Sorted ``datetime64`` time index shared by all rows.
+        peakPos (np.ndarray): Per-row position one past the time of peak storage.
+        n_day (float): Duration in days. With a regular ``step`` it must be a whole
+            number of steps.
+        step (float, optional): Regular time step in seconds, or None for an
+            irregular series.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Window end position,
+        window begin position, peak n-day mean flow and truncated volume-window ratio
+        per row. Rows without a complete window have a negative end position and NaN
+        flow and ratio.
+    """
+    rows = np.arange(cs.shape[0])
+    span = np.timedelta64(int(round(86400 * n_day)), "s")
+    if step is not None:
+        window = int(round(86400 * n_day / step))
+        means = _rollingWindowMeans(cs, nanCount, window)
+        ends = np.arange(window, window + means.shape[-1])
+        volumeFactor = step
+    else:
+        n = len(times)
+        ends = np.arange(n)
+        starts = np.searchsorted(times, times - span, side="left")
+        covered = (times - times[starts]).astype("timedelta64[ns]").astype(np.int64) / 1e9
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = (cs[..., :n] - cs[..., starts]) / covered
+        incomplete = (times - span < times[0]) | (covered <= 0)
+        means[..., incomplete] = np.nan
+        means[(nanCount[..., :n] - nanCount[..., starts]) > 0] = np.nan
+        volumeFactor = 1.0
+
+    valid = ~np.isnan(means).all(axis=-1) if means.shape[-1] else np.zeros(len(rows), bool)
+    if not valid.any():
+        nan = np.full(len(rows), np.nan)
+        return np.full(len(rows), -1), np.full(len(rows), -1), nan, nan.copy()
+
+    # nanargmax semantics: first maximum, ignoring missing windows
+    best = np.where(np.isnan(means), -np.inf, means).argmax(axis=-1)
+    max_val = np.where(valid, means[rows, best], np.nan)
+    idx_max = np.where(valid, ends[best], -1)
+
+    beginWindow = times[ends[best]] - span
+    beginPos = np.where(valid, np.searchsorted(times, beginWindow, side="left"), -1)
+
+    event = cs[rows, peakPos] - cs[rows, np.maximum(beginPos, 0)]
+    v_event_n_day_window = np.maximum(event, 0.0) * volumeFactor
+    n_day_vol = max_val * 86400 * n_day
+    norm_vol = np.trunc(v_event_n_day_window / n_day_vol * 1000) / 1000
+    return idx_max, beginPos, max_val, norm_vol
+
+
+def _curveWindows(
+    cs: np.ndarray, nanCount: np.ndarray, windows: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Maximum rolling mean for many window lengths of one regular series.
+
+    Window lengths are evaluated in blocks as 2-D differences of the shared
+    prefix sum, so each block is one vectorized gather and ``argmax``; block size
+    is capped at ``_CURVE_BLOCK_ELEMENTS`` values.
+
+    Args:
+        cs (np.ndarray): 1-D flow prefix sum (see ``_flowPrefixSums``).
+        nanCount (np.ndarray): 1-D missing-count prefix sum.
+        windows (np.ndarray): Window lengths in rows.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Window end position (-1 if the window does
+        not fit) and peak mean flow (NaN if it does not) per window length, with
+        the same conventions as ``_durationWindows``.
+    """
+    n = len(cs) - 1
+    starts = np.arange(n)
+    idx_max = np.full(len(windows), -1)
+    max_val = np.full(len(windows), np.nan)
+    block = max(1, _CURVE_BLOCK_ELEMENTS // max(n, 1))
+    for lo in range(0, len(windows), block):
+        window = windows[lo : lo + block, np.newaxis]
+        ends = starts + window
+        invalid = ends >= n
+        ends = np.minimum(ends, n)
+        means = (cs[ends] - cs[starts]) / window
+        invalid |= (nanCount[ends] - nanCount[starts]) > 0
+        means[invalid] = -np.inf
+
+        best = means.argmax(axis=-1)
+        rows = np.arange(len(window))
+        found = ~invalid[rows, best]
+        idx_max[lo : lo + block] = np.where(found, best + window[:, 0], -1)
+        max_val[lo : lo + block] = np.where(found, means[rows, best], np.nan)
+    return idx_max, max_val
+
+
+def _volumeWindowResults(
+    flow: np.ndarray,
+    times: np.ndarray,
+    time_peak_stor: pd.Timestamp,
+    durations: List[int],
+    interval: float = None,
+) -> Dict[int, dict]:
+    """
+    Computes the volume window of each duration for a single hydrograph.
+
+    Args:
+        flow (np.ndarray): Inflow values.
+        times (np.ndarray): Sorted ``datetime64`` time index of ``flow``.
+        time_peak_stor (pd.Timestamp): Timestamp of the peak storage event.
+        durations (List[int]): List of durations (in days).
+        interval (float, optional): Record interval in seconds; see ``_timeSteps``.
+
+    Returns:
+        Dict[int, dict]: Per duration, 'window_start' and 'window_end' (epoch
+        nanoseconds), 'max_flow' (peak n-day mean flow) and 'ratio'.
+
+    Raises:
+        ValueError: If the record is shorter than one of the requested durations.
+    """
+    steps = _timeSteps(times, interval)
+    step = _regularStep(steps)
+    cs, nanCount = _flowPrefixSums(flow[np.newaxis, :], None if step else steps)
+    peakPos = np.searchsorted(times, np.datetime64(time_peak_stor), side="right")
+    peakPos = np.atleast_1d(peakPos)
+    epoch = times.astype("datetime64[ns]").astype(np.int64)
+
+    results = {}
+    for n_day in durations:
+        idx_max, beginPos, max_val, norm_vol = _durationWindows(
+            cs, nanCount, times, peakPos, n_day, step
+        )
+        if idx_max[0] < 0:
+            raise ValueError(f"Record is too short for a {n_day}-day window")
+        results[n_day] = {
+            "window_start": int(epoch[beginPos[0]]),
+            "window_end": int(epoch[idx_max[0]]),
+            "max_flow": float(max_val[0]),
+            "ratio": float(norm_vol[0]),
+        }
+    return results
 
 
 def volumeWindowCalculations(
-    df: pd.DataFrame, time_peak_stor: pd.Timestamp, durations: List[int]
+    df: pd.DataFrame,
+    time_peak_stor: pd.Timestamp,
+    durations: List[int],
+    cache: ResultCache = None,
 ) -> Tuple[pd.DataFrame, dict]:
     """
     Performs rolling volume calculations for specified durations and normalizes the results.
@@ -53,118 +591,405 @@ def volumeWindowCalculations(
         df (pd.DataFrame): DataFrame containing flow data with a 'flow' column.
         time_peak_stor (pd.Timestamp): Timestamp of the peak storage event.
         durations (List[int]): List of durations (in days) for rolling volume calculations.
+        cache (ResultCache, optional): Memo of per-duration results keyed on the
+            content of ``df.flow``; only durations missing from it are computed.
 
     Returns:
         Tuple[pd.DataFrame, dict]: 
             - Updated DataFrame with rolling volume calculations.
             - Dictionary containing normalized volumes for each duration.
 
+    Raises:
+        ValueError: If the record is shorter than one of the requested durations.
+
     Notes:
-        - Rolling averages are calculated for each duration.
+        - A single cumulative sum of flow is shared by every duration; each n-day
+          window sum is the difference of two of its elements.
+        - Window lengths and volumes follow the record's time step, which is
+          inferred from the index (see ``getVolumeWindowSummary``).
+        - Window bounds and the event volume are located with ``searchsorted`` on
+          the (sorted) time index instead of full-length boolean masks.
         - Normalized volumes are computed as the ratio of event volume to n-day volume.
         - Adds new columns for each n-day metric and masks values outside the event window.
     """
+    summary = getVolumeWindowSummary(df, time_peak_stor, durations, cache)
+    times = df.index.values
+
     max_vols = {}
-    for n_day in durations:
-        met = f"{n_day}".zfill(3) + "-day"
-        df.loc[:, met] = df.flow.rolling(n_day * 24, closed="left").mean()
+    for n_day, row in summary.iterrows():
+        met = _metricName(n_day)
+        logger.debug("%s %s", met, row.max_flow)
+
+        # Mask out all values outside window
+        beginPos = np.searchsorted(times, np.datetime64(row.window_start), side="left")
+        endPos = np.searchsorted(times, np.datetime64(row.window_end), side="right")
+        column = np.full(len(times), np.nan)
+        column[beginPos:endPos] = row.max_flow
+        df[met] = column
+        max_vols.update({met: row.ratio})
 
-        idx_max = df[met].idxmax()
-        max_val = df[met].max()
-        print(met, max_val)
-        n_day_vol = max_val * 86400 * n_day
+    return df, max_vols
 
-        beginWindow = idx_max - pd.DateOffset(hours=24 * n_day)
-        endWindow = idx_max
 
-        eventMask = (df.index >= beginWindow) & (df.index <= time_peak_stor)
-        windowMask = (df.index >= beginWindow) & (df.index <= endWindow)
+def channelExceedanceTimes(
+    flowOut: np.ndarray,
+    index: pd.DatetimeIndex,
+    capacities: List[float],
+) -> np.ndarray:
+    """
+    First time outflow exceeds each of many downstream channel capacities.
 
-        v_event_n_day_window = df.loc[eventMask, "flow"].sum() * 3600
-        norm_vol = v_event_n_day_window / n_day_vol
-        norm_vol = int(norm_vol * 1000) / 1000  # Mask out all values outside window
-        df.loc[(windowMask), met] = max_val
-        df.loc[df[met] != max_val, met] = np.nan
-        max_vols.update({met: norm_vol})
+    The running maximum of outflow is non-decreasing, so the first exceedance of
+    every capacity is one ``searchsorted`` into it. A sweep over any number of
+    capacities therefore costs one pass over the record per scenario.
 
-    return df, max_vols
+    Args:
+        flowOut (np.ndarray): Outflow of shape (time,) or (scenarios, time).
+        index (pd.DatetimeIndex): Sorted time index shared by every scenario.
+        capacities (List[float]): Candidate channel capacities (cfs), in any order.
 
+    Returns:
+        np.ndarray: ``datetime64`` times of shape ``flowOut.shape[:-1] +
+        (len(capacities),)``; NaT where outflow never exceeds the capacity.
 
-def getVolumeWindowData(
+    Raises:
+        ValueError: If the outflow length does not match the time index.
+    """
+    flowOut = np.asarray(flowOut, dtype=np.float64)
+    capacities = np.asarray(capacities, dtype=np.float64)
+    times = pd.DatetimeIndex(index).values
+    if flowOut.shape[-1] != len(times):
+        raise ValueError(
+            f"flowOut {flowOut.shape} must have {len(times)} values along its last axis"
+        )
+
+    running = np.maximum.accumulate(
+        np.where(np.isnan(flowOut), -np.inf, flowOut), axis=-1
+    )
+    rows = running.reshape(-1, len(times))
+    # First position whose running maximum is strictly above each capacity
+    positions = np.stack(
+        [np.searchsorted(row, capacities, side="right") for row in rows]
+    )
+    exceed = np.full(positions.shape, np.datetime64("NaT"), dtype=times.dtype)
+    found = positions < len(times)
+    exceed[found] = times[positions[found]]
+    return exceed.reshape(flowOut.shape[:-1] + (len(capacities),))
+
+
+def batchVolumeWindowCalculations(
+    flowIn: np.ndarray,
+    elev: np.ndarray,
+    index: pd.DatetimeIndex,
+    durations: List[int] = [1, 2, 3, 5, 7],
+    flowOut: np.ndarray = None,
+    capacities: List[float] = None,
+) -> BatchVolumeWindows:
+    """
+    Computes volume windows for many scenarios at once.
+
+    Each row of ``flowIn`` and ``elev`` is one scenario (e.g. one collection ID or
+    scale factor); all rows share ``index``. The results match calling
+    ``volumeWindowCalculations`` on each scenario with the time of peak storage
+    taken as the first maximum of that scenario's pool elevation.
+
+    Args:
+        flowIn (np.ndarray): Inflow array of shape (scenarios, time).
+        elev (np.ndarray): Pool elevation array of shape (scenarios, time).
+        index (pd.DatetimeIndex): Sorted time index shared by every scenario.
+        durations (List[int]): List of durations (in days) for rolling volume calculations.
+        flowOut (np.ndarray, optional): Outflow array of shape (scenarios, time).
+        capacities (List[float], optional): Downstream channel capacities to find the
+            first exceedance of (see ``channelExceedanceTimes``); requires ``flowOut``.
+
+    Returns:
+        BatchVolumeWindows: Ratios, peak n-day flows and window bounds per scenario and
+        duration, the time of peak storage per scenario and, with ``capacities``,
+        the first channel exceedance per scenario and capacity.
+
+    Raises:
+        ValueError: If the array shapes do not match the time index, or
+            ``capacities`` are given without ``flowOut``.
+    """
+    flowIn = np.atleast_2d(flowIn)
+    elev = np.atleast_2d(elev)
+    if flowIn.shape != elev.shape or flowIn.shape[-1] != len(index):
+        raise ValueError(
+            f"flowIn {flowIn.shape} and elev {elev.shape} must both be "
+            f"(scenarios, {len(index)})"
+        )
+
+    times = pd.DatetimeIndex(index).values
+    missingElev = np.isnan(elev).all(axis=-1)
+    peakIdx = np.where(missingElev[:, np.newaxis], 0, np.nan_to_num(elev, nan=-np.inf))
+    peakIdx = peakIdx.argmax(axis=-1)
+    time_peak_stor = np.where(missingElev, np.datetime64("NaT"), times[peakIdx])
+
+    steps = _timeSteps(times)
+    step = _regularStep(steps)
+    cs, nanCount = _flowPrefixSums(flowIn, None if step else steps)
+    shape = (flowIn.shape[0], len(durations))
+    ratios = np.full(shape, np.nan)
+    max_flow = np.full(shape, np.nan)
+    window_start = np.full(shape, np.datetime64("NaT"), dtype=times.dtype)
+    window_end = window_start.copy()
+    for j, n_day in enumerate(durations):
+        idx_max, beginPos, max_val, norm_vol = _durationWindows(
+            cs, nanCount, times, peakIdx + 1, n_day, step
+        )
+        ok = (idx_max >= 0) & ~missingElev
+        ratios[ok, j] = norm_vol[ok]
+        max_flow[ok, j] = max_val[ok]
+        window_start[ok, j] = times[beginPos[ok]]
+        window_end[ok, j] = times[idx_max[ok]]
+
+    time_exceed = None
+    if capacities is not None:
+        if flowOut is None:
+            raise ValueError("capacities need the flowOut array")
+        capacities = np.asarray(capacities, dtype=np.float64)
+        time_exceed = channelExceedanceTimes(np.atleast_2d(flowOut), index, capacities)
+
+    return BatchVolumeWindows(
+        np.asarray(durations),
+        ratios,
+        max_flow,
+        window_start,
+        window_end,
+        time_peak_stor,
+        capacities,
+        time_exceed,
+    )
+
+
+def getCriticalDurationCurve(
+    df: pd.DataFrame,
+    time_peak_stor: pd.Timestamp,
+    max_days: float = 7,
+    resolution: str = None,
+) -> CriticalDurationCurve:
+    """
+    Computes the volume-window ratio for every duration up to ``max_days``.
+
+    Rather than a handful of ``durations``, the curve covers every multiple of
+    ``resolution`` (1 hour by default) from one resolution step to ``max_days``
+    in a single sweep over one prefix sum. At whole days the values equal those
+    of ``getVolumeWindowSummary``.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing flow data with a 'flow' column; the
+            time step is taken as in ``getVolumeWindowSummary``.
+        time_peak_stor (pd.Timestamp): Timestamp of the peak storage event.
+        max_days (float, optional): Longest duration in days.
+        resolution (str, optional): Duration spacing as a pandas timedelta string
+            (e.g. '1h', '15min'). Defaults to 1 hour or the record step if longer.
+
+    Returns:
+        CriticalDurationCurve: The curve and the critical duration. Durations that do
+        not fit in the record hold NaN / NaT.
+
+    Raises:
+        ValueError: If ``resolution`` is not a multiple of a regular record step.
+    """
+    flow = df.flow.to_numpy()
+    times = df.index.values
+    steps = _timeSteps(times, df.attrs.get("interval"))
+    step = _regularStep(steps)
+
+    if resolution is None:
+        resolution = pd.Timedelta(seconds=max(3600.0, step or 0.0))
+    resolution = pd.Timedelta(resolution).total_seconds()
+    if step is not None and resolution % step:
+        raise ValueError(
+            f"resolution ({resolution:g} s) must be a multiple of the record step ({step:g} s)"
+        )
+    seconds = resolution * np.arange(1, int(max_days * 86400 // resolution) + 1)
+    n_days = seconds / 86400
+
+    cs, nanCount = _flowPrefixSums(flow[np.newaxis, :], None if step else steps)
+    peakPos = np.searchsorted(times, np.datetime64(time_peak_stor), side="right")
+    with stage("rolling_calc", durations=len(seconds)) as s:
+        if step is not None:
+            windows = np.round(seconds / step).astype(np.int64)
+            idx_max, max_val = _curveWindows(cs[0], nanCount[0], windows)
+            beginPos = np.where(idx_max >= 0, idx_max - windows, -1)
+            event = cs[0, peakPos] - cs[0, np.maximum(beginPos, 0)]
+            v_event = np.maximum(event, 0.0) * step
+            norm_vol = np.trunc(v_event / (max_val * 86400 * n_days) * 1000) / 1000
+        else:
+            columns = [
+                _durationWindows(cs, nanCount, times, np.atleast_1d(peakPos), n_day, None)
+                for n_day in n_days
+            ]
+            idx_max, beginPos, max_val, norm_vol = (
+                np.concatenate(values) for values in zip(*columns)
+            )
+        s.rows = len(flow)
+
+    found = idx_max >= 0
+    window_start = np.full(len(seconds), np.datetime64("NaT"), dtype=times.dtype)
+    window_end = window_start.copy()
+    window_start[found] = times[beginPos[found]]
+    window_end[found] = times[idx_max[found]]
+    curve = pd.DataFrame(
+        {
+            "window_start": window_start,
+            "window_end": window_end,
+            "max_flow": max_val,
+            "ratio": np.where(found, norm_vol, np.nan),
+        },
+        index=pd.TimedeltaIndex(pd.to_timedelta(seconds, unit="s"), name="duration"),
+    )
+
+    distance = np.abs(curve.ratio.to_numpy() - 1)
+    if np.isnan(distance).all():
+        critical = pd.NaT
+    else:
+        critical = curve.index[np.nanargmin(distance)]
+    return CriticalDurationCurve(curve, critical)
+
+
+class VolumeWindowRecords(NamedTuple):
+    """Inflow, outflow and pool elevation records of one scenario, as read from DSS."""
+
+    flowIn: pd.DataFrame
+    flowOut: pd.DataFrame
+    elev: pd.DataFrame
+
+
+def readVolumeWindowRecords(
     dss_file: str,
-    sf: float,
-    year: int,
-    ds_channel_capacity: int,
     pathFlowIn: str,
     pathFlowOut: str,
     pathElev: str,
     window: Tuple[str, str],
-) -> Tuple[pd.DataFrame, NamedTuple]:
+    session: DssSession = None,
+) -> VolumeWindowRecords:
     """
-    Extracts flow and elevation data from a DSS file and identifies critical times.
+    Reads the three records ``getVolumeWindowData`` works on.
+
+    This is the I/O half of ``getVolumeWindowData``; it can run ahead of the
+    computation, e.g. on a prefetch thread (see ``prefetch.prefetchItems``).
 
     Args:
         dss_file (str): Path to the DSS file.
-        sf (float): Scale factor for the analysis.
-        year (int): Year of the analysis.
-        ds_channel_capacity (int): Downstream channel capacity.
         pathFlowIn (str): DSS path for inflow data.
         pathFlowOut (str): DSS path for outflow data.
         pathElev (str): DSS path for elevation data.
         window (Tuple[str, str]): Time window for data extraction (start, end).
+        session (DssSession, optional): Open session to read from. When omitted the
+            file is opened once for the three reads and closed afterwards.
 
     Returns:
-        Tuple[pd.DataFrame, NamedTuple]: 
-            - DataFrame containing inflow data.
-            - NamedTuple with critical times (time_peak_stor, time_ds_channel_exceed).
+        VolumeWindowRecords: Inflow, outflow and elevation DataFrames.
 
     Raises:
-        AssertionError: If the DSS file or paths are invalid.
+        AssertionError: If the DSS file does not exist.
     """
-    sf = f"{sf:.2f}"
-    assert len(str(year)) == 4, "Year must be 4 digit with format YYYY"
     assert os.path.exists(dss_file), f"Cannot locate DSS file {dss_file}"
-    print(f"{year} Hydrograph, {sf} Scale Factor.....")
-
-    CriticalTimes = namedtuple(
-        "CriticalTimes", ["time_peak_stor", "time_ds_channel_exceed"]
-    )
+    if session is None:
+        with DssSession(dss_file) as session:
+            return readVolumeWindowRecords(
+                dss_file, pathFlowIn, pathFlowOut, pathElev, window, session
+            )
 
     flowIn = readDssData(
         dss_file,
         pathFlowIn,
         variable="flow",
         window=window,
+        session=session,
     )
     flowOut = readDssData(
         dss_file,
         pathFlowOut,
         variable="flow",
         window=window,
+        session=session,
     )
     elev = readDssData(
         dss_file,
         pathElev,
         variable="elev",
         window=window,
+        session=session,
     )
+    return VolumeWindowRecords(flowIn, flowOut, elev)
 
-    time_peak_stor = elev.elev.idxmax()
-    print(f"Time of peak Storage {time_peak_stor}")
 
-    flowOut = flowOut.loc[flowOut.flow > ds_channel_capacity, :]
-    if not flowOut.empty:
-        time_exceed = flowOut.index.min()
-        print(f"Time of Downstream Channel Exceedance {time_exceed}")
-    else:
-        time_exceed = None
+def getVolumeWindowData(
+    dss_file: str,
+    sf: float,
+    year: int,
+    ds_channel_capacity: int,
+    pathFlowIn: str,
+    pathFlowOut: str,
+    pathElev: str,
+    window: Tuple[str, str],
+    session: DssSession = None,
+    records: VolumeWindowRecords = None,
+) -> Tuple[pd.DataFrame, NamedTuple]:
+    """
+    Extracts flow and elevation data from a DSS file and identifies critical times.
+
+    Args:
+        dss_file (str): Path to the DSS file.
+        sf (float): Scale factor for the analysis.
+        year (int): Year of the analysis.
+        ds_channel_capacity (int): Downstream channel capacity.
+        pathFlowIn (str): DSS path for inflow data.
+        pathFlowOut (str): DSS path for outflow data.
+        pathElev (str): DSS path for elevation data.
+        window (Tuple[str, str]): Time window for data extraction (start, end).
+        session (DssSession, optional): Open session to read from. When omitted the
+            file is opened once for the three reads and closed afterwards.
+        records (VolumeWindowRecords, optional): The records, already read with
+            ``readVolumeWindowRecords``; nothing is read from DSS when given.
+
+    Returns:
+        Tuple[pd.DataFrame, NamedTuple]: 
+            - DataFrame containing inflow data.
+            - NamedTuple with critical times (time_peak_stor, time_ds_channel_exceed).
+
+    Raises:
+        AssertionError: If the DSS file or paths are invalid.
+    """
+    assert len(str(year)) == 4, "Year must be 4 digit with format YYYY"
+    if records is None:
+        records = readVolumeWindowRecords(
+            dss_file, pathFlowIn, pathFlowOut, pathElev, window, session
+        )
+    flowIn, flowOut, elev = records
+
+    sf = f"{sf:.2f}"
+    logger.info("%s Hydrograph, %s Scale Factor.....", year, sf)
+
+    CriticalTimes = namedtuple(
+        "CriticalTimes", ["time_peak_stor", "time_ds_channel_exceed"]
+    )
+
+    with stage("peak_detection") as s:
+        time_peak_stor = elev.elev.idxmax()
+        time_exceed = channelExceedanceTimes(
+            flowOut.flow.to_numpy(), flowOut.index, [ds_channel_capacity]
+        )[0]
+        time_exceed = pd.Timestamp(time_exceed) if not np.isnat(time_exceed) else None
+        s.rows = len(elev)
+    logger.info("Time of peak Storage %s", time_peak_stor)
+    if time_exceed is not None:
+        logger.info("Time of Downstream Channel Exceedance %s", time_exceed)
     criticalTimes = CriticalTimes(time_peak_stor, time_exceed)
 
     return flowIn, criticalTimes
 
 
 def readDssData(
-    dss_file: str, path: str, variable: str, window: Tuple[str, str] = None
+    dss_file: str,
+    path: str,
+    variable: str,
+    window: Tuple[str, str] = None,
+    session: DssSession = None,
+    cache: SeriesCache = None,
 ) -> pd.DataFrame:
     """
     Reads time-series data from a DSS file for a specified path and time window.
@@ -174,6 +999,10 @@ def readDssData(
         path (str): DSS path in the format /A/B/C/D/E/F/.
         variable (str): Variable name for the data (e.g., 'flow', 'elev').
         window (Tuple[str, str], optional): Time window for data extraction (start, end).
+        session (DssSession, optional): Open session to read from instead of opening
+            and closing ``dss_file`` for this call.
+        cache (SeriesCache, optional): On-disk cache consulted before reading when no
+            session is given; a session uses its own cache.
 
     Returns:
         pd.DataFrame: DataFrame containing the extracted time-series data.
@@ -181,16 +1010,8 @@ def readDssData(
     Raises:
         AssertionError: If the DSS path format is invalid.
     """
-    assert len(path.split("/")) == 8, (
-        f"Path must be in the format /A/B/C/D/E/F/, but is {path}"
-    )
-
-    fid = HecDss.Open(dss_file)
-    ts = fid.read_ts(path, window=window, trim_missing=False)
-    times = ts.pytimes
-    values = ts.values
-    idx = pd.Index(times, name="date")
-    tmp = pd.DataFrame(index=idx, data=values.copy(), columns=[variable])
-    fid.close()
+    if session is not None:
+        return session.read(path, variable, window)
 
-    return tmp
+    with DssSession(dss_file, cache) as session:
+        return session.read(path, variable, window)
@@ -0,0 +1,334 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from .cache import SeriesCache
+from .instrumentation import stage
+
+
+_INTERVAL_UNITS = {"MIN": 60, "MINUTE": 60, "HOUR": 3600, "DAY": 86400, "WEEK": 604800}
+
+
+def intervalSeconds(epart: str) -> Optional[float]:
+    """
+    Parses a regular DSS interval E-part such as '15MIN', '1HOUR' or '1DAY'.
+
+    Args:
+        epart (str): E-part of a DSS pathname.
+
+    Returns:
+        Optional[float]: Interval in seconds, or None for irregular ('IR-...') and
+        calendar (month, year) intervals.
+    """
+    match = re.fullmatch(r"(\d+)([A-Z]+)", epart.strip().upper())
+    if match is None or match.group(2) not in _INTERVAL_UNITS:
+        return None
+    return float(int(match.group(1)) * _INTERVAL_UNITS[match.group(2)])
+
+
+# HEC julian day 0; DSS record times count granularity units from a base julian day
+_HEC_EPOCH = np.datetime64("1899-12-31T00:00:00", "ns")
+_MAX_SHARED_INDEXES = 64
+
+
+def _parseDssTime(text: str) -> pd.Timestamp:
+    """
+    Parses a DSS window time such as ``"02Dec2021 24:00"``.
+
+    DSS writes the end of a day as 24:00 (or 2400) of that day, which pandas
+    rejects; it is read as 00:00 of the next day.
+    """
+    endOfDay = re.fullmatch(r"(.*\S)\s+24:?00(?::00)?", text.strip())
+    if endOfDay:
+        return pd.Timestamp(endOfDay.group(1)) + pd.Timedelta("1D")
+    return pd.Timestamp(text.strip())
+
+
+class _ValuesBuffer:
+    """
+    Exposes a DSS container's values buffer to NumPy without copying it.
+
+    The array built on this object keeps it, and so both ``values`` (whose
+    interface is copied, and which may be a temporary view made by the
+    container) and the container that owns the memory, alive for as long as
+    the array (or a DataFrame wrapping it) exists.
+    """
+
+    __slots__ = ("__array_interface__", "_owner")
+
+    def __init__(self, values: np.ndarray, owner):
+        self.__array_interface__ = values.__array_interface__
+        self._owner = (values, owner)
+
+
+def _recordTimes(ts) -> Optional[np.ndarray]:
+    """
+    Builds ``datetime64[ns]`` times from a container's integer times, or returns
+    None if the container does not expose them (the caller then uses ``pytimes``).
+    """
+    try:
+        times = np.asarray(ts.times, dtype=np.int64)
+        granularity = int(ts.granularity)
+        base = int(ts.julianBaseDate)
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if granularity <= 0 or len(times) != len(ts.values):
+        return None
+    seconds = base * 86400 + times * granularity
+    dates = _HEC_EPOCH + seconds.astype("timedelta64[s]")
+    try:
+        start = pd.Timestamp(ts.startDateTime)
+    except (AttributeError, TypeError, ValueError):
+        return dates
+    # Guard against a container whose integer times use another convention
+    return dates if not len(dates) or dates[0] == start else None
+
+
+def _recordFrame(
+    ts, variable: str, interval: Optional[float], indexes: dict, key: tuple = None
+) -> pd.DataFrame:
+    """
+    Wraps a DSS time series container in a DataFrame without copying its values.
+
+    Args:
+        ts: Container returned by ``read_ts``.
+        variable (str): Column name for the data.
+        interval (float, optional): Record interval in seconds (None if irregular).
+        indexes (dict): Time indexes already built, reused for regular records with
+            the same ``key`` and times.
+        key (tuple, optional): Window and E-part of the read.
+
+    Returns:
+        pd.DataFrame: DataFrame indexed by 'date' with a single ``variable`` column.
+    """
+    dates = _recordTimes(ts)
+    if dates is None:
+        idx = pd.DatetimeIndex(ts.pytimes, name="date")
+    else:
+        shareKey = None
+        if interval is not None and len(dates):
+            shareKey = (key, len(dates), dates[0], dates[-1])
+        idx = indexes.get(shareKey) if shareKey is not None else None
+        if idx is None:
+            idx = pd.DatetimeIndex(dates, name="date")
+            if shareKey is not None:
+                if len(indexes) >= _MAX_SHARED_INDEXES:
+                    indexes.pop(next(iter(indexes)))
+                indexes[shareKey] = idx
+    values = np.asarray(_ValuesBuffer(np.asarray(ts.values), ts))
+    return pd.DataFrame({variable: values}, index=idx, copy=False)
+
+
+class DssSession:
+    """
+    Keeps a DSS file open so repeated reads do not reopen it.
+
+    Use as a context manager::
+
+        with DssSession("data/Terminus_Data.dss") as session:
+            flowIn = session.read(pathFlowIn, "flow", window)
+            data = session.read_many({"inflow": pathFlowIn, "elev": pathElev}, window)
+
+    The file is opened on the first read that is not served from ``cache``, so a
+    fully cached run never opens the DSS file.
+
+    Args:
+        dss_file (str): Path to the DSS file.
+        cache (SeriesCache, optional): On-disk cache consulted before reading.
+
+    Raises:
+        AssertionError: If the DSS file does not exist.
+    """
+
+    def __init__(self, dss_file: str, cache: SeriesCache = None):
+        assert os.path.exists(dss_file), f"Cannot locate DSS file {dss_file}"
+        self.dss_file = dss_file
+        self.cache = cache
+        self._fid = None
+        self._closed = False
+        self._indexes = {}
+
+    def __enter__(self) -> "DssSession":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self) -> None:
+        """Closes the underlying DSS handle. Safe to call more than once."""
+        self._closed = True
+        self._indexes.clear()
+        if self._fid is not None:
+            self._fid.close()
+            self._fid = None
+
+    def _handle(self):
+        if self._closed:
+            raise ValueError(f"DSS session for {self.dss_file} is closed")
+        if self._fid is None:
+            # Imported here so compute-only use of the package does not load pydsstools
+            from pydsstools.heclib.dss import HecDss
+
+            with stage("dss_open", file=self.dss_file):
+                self._fid = HecDss.Open(self.dss_file)
+        return self._fid
+
+    def read(
+        self, path: str, variable: str, window: Tuple[str, str] = None
+    ) -> pd.DataFrame:
+        """
+        Reads one time series from the open file.
+
+        Args:
+            path (str): DSS path in the format /A/B/C/D/E/F/.
+            variable (str): Column name for the data (e.g., 'flow', 'elev').
+            window (Tuple[str, str], optional): Time window for data extraction (start, end).
+
+        Returns:
+            pd.DataFrame: DataFrame indexed by 'date' with a single ``variable`` column.
+            ``attrs["interval"]`` holds the record interval in seconds parsed from the
+            E-part (None for irregular records). The values wrap the DSS buffer
+            without a copy, and regular records read with the same window and
+            interval share one index object.
+
+        Raises:
+            AssertionError: If the DSS path format is invalid.
+            ValueError: If the session has been closed.
+        """
+        assert len(path.split("/")) == 8, (
+            f"Path must be in the format /A/B/C/D/E/F/, but is {path}"
+        )
+        if self.closed:
+            raise ValueError(f"DSS session for {self.dss_file} is closed")
+        interval = intervalSeconds(path.split("/")[5])
+        if self.cache is not None:
+            with stage("dss_read", path=path, cached=True) as s:
+                cached = self.cache.get(self.dss_file, path, variable, window)
+                if cached is not None:
+                    cached.attrs["interval"] = interval
+                    s.rows = len(cached)
+                    return cached
+
+        fid = self._handle()
+        with stage("dss_read", path=path, cached=False) as s:
+            ts = fid.read_ts(path, window=window, trim_missing=False)
+            tmp = _recordFrame(
+                ts, variable, interval, self._indexes, (window, path.split("/")[5])
+            )
+            tmp.attrs["interval"] = interval
+            s.rows = len(tmp)
+
+        if self.cache is not None:
+            self.cache.put(self.dss_file, path, window, tmp)
+        return tmp
+
+    def read_chunks(
+        self,
+        path: str,
+        variable: str,
+        window: Tuple[str, str],
+        chunk: str = "365D",
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Reads one time series as consecutive, non-overlapping time chunks.
+
+        Only one chunk is held in memory at a time, so long period-of-record
+        series can be processed with bounded memory (see
+        ``streaming.streamVolumeWindowSummary``).
+
+        Args:
+            path (str): DSS path in the format /A/B/C/D/E/F/.
+            variable (str): Column name for the data (e.g., 'flow', 'elev').
+            window (Tuple[str, str]): Time window for data extraction (start, end).
+            chunk (str, optional): Chunk length as a pandas timedelta string.
+
+        Yields:
+            pd.DataFrame: Chunks as returned by ``read``, in time order.
+        """
+        start, end = (_parseDssTime(t) for t in window)
+        chunk = pd.Timedelta(chunk)
+        while start <= end:
+            # DSS windows include both ends; stop one minute before the next chunk
+            stop = min(start + chunk - pd.Timedelta("1min"), end)
+            yield self.read(
+                path,
+                variable,
+                (start.strftime("%d%b%Y %H:%M"), stop.strftime("%d%b%Y %H:%M")),
+            )
+            start += chunk
+
+    def pathnames(self, pattern: str = "/*/*/*/*/*/*/") -> List[str]:
+        """
+        Lists the pathnames in the file's catalog.
+
+        Args:
+            pattern (str, optional): Pathname pattern with ``*`` wildcards.
+
+        Returns:
+            List[str]: Matching pathnames, one per stored record block.
+
+        Raises:
+            ValueError: If the session has been closed.
+        """
+        return list(self._handle().getPathnameList(pattern, sort=1))
+
+    def read_many(
+        self,
+        paths: Union[List[str], Dict[str, str]],
+        window: Tuple[str, str] = None,
+    ) -> pd.DataFrame:
+        """
+        Reads several time series and aligns them in one DataFrame.
+
+        Args:
+            paths (Union[List[str], Dict[str, str]]): DSS paths to read. A dict maps
+                column names to paths; a list uses the paths as column names.
+            window (Tuple[str, str], optional): Time window for data extraction (start, end).
+
+        Returns:
+            pd.DataFrame: DataFrame indexed by 'date' with one column per path.
+        """
+        if not isinstance(paths, dict):
+            paths = {path: path for path in paths}
+        frames = [self.read(path, name, window) for name, path in paths.items()]
+        return pd.concat(frames, axis=1)
+
+
+_sessions: Dict[str, DssSession] = {}
+
+
+def openSession(dss_file: str, cache: SeriesCache = None) -> DssSession:
+    """
+    Returns a pooled session for ``dss_file``, opening it on first use.
+
+    Sessions are keyed by absolute file path and stay open until
+    ``closeSessions`` is called, so long-running processes (e.g. pool workers)
+    open each file once.
+
+    Args:
+        dss_file (str): Path to the DSS file.
+        cache (SeriesCache, optional): On-disk cache for the session to use. Replaces
+            the cache of an already pooled session.
+
+    Returns:
+        DssSession: Open session for the file.
+    """
+    key = os.path.abspath(dss_file)
+    session = _sessions.get(key)
+    if session is None or session.closed:
+        session = _sessions[key] = DssSession(dss_file, cache)
+    elif cache is not None:
+        session.cache = cache
+    return session
+
+
+def closeSessions() -> None:
+    """Closes every pooled session opened by ``openSession``."""
+    while _sessions:
+        _, session = _sessions.popitem()
+        session.close()
@@ -0,0 +1,299 @@
+import numpy as np
+import pandas as pd
+from typing import List, Tuple
+from .data_processing import (
+    _durationWindows,
+    _flowPrefixSums,
+    _regularStep,
+    _timeSteps,
+    getVolumeWindowSummary,
+)
+from .dss import DssSession, intervalSeconds
+from .instrumentation import stage
+
+METHODS = ("annual", "threshold")
+
+
+def _segmentPeaks(
+    values: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Maximum and position of its first occurrence in each ``values[start:end]``.
+
+    Segments must be non-empty, sorted and non-overlapping. Both reductions are
+    single ``reduceat`` calls over the interleaved segment bounds.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Segment maxima (-inf if all missing) and
+        their positions in ``values``.
+    """
+    n = len(values)
+    filled = np.append(np.where(np.isnan(values), -np.inf, values), -np.inf)
+    bounds = np.column_stack([starts, ends]).ravel()
+    peaks = np.maximum.reduceat(filled, bounds)[::2]
+
+    positions = np.arange(n + 1)
+    segment = np.clip(np.searchsorted(starts, positions, side="right") - 1, 0, None)
+    inSegment = (positions >= starts[segment]) & (positions < ends[segment])
+    candidates = np.where(inSegment & (filled == peaks[segment]), positions, n)
+    first = np.minimum.reduceat(candidates, bounds)[::2]
+    return peaks, first
+
+
+def detectEvents(
+    elev: pd.Series,
+    method: str = "annual",
+    threshold: float = None,
+    separation: str = "7D",
+    water_year_start: int = 10,
+) -> pd.DataFrame:
+    """
+    Finds independent peak-storage events in a pool elevation record.
+
+    With ``method="threshold"`` each run of elevations above ``threshold`` is an
+    event; runs closer than ``separation`` are merged into one. With
+    ``method="annual"`` the maximum of each water year is an event, and of two
+    annual peaks closer than ``separation`` only the higher is kept.
+
+    Args:
+        elev (pd.Series): Pool elevation indexed by time.
+        method (str, optional): ``"annual"`` or ``"threshold"``.
+        threshold (float, optional): Elevation threshold for ``"threshold"``.
+        separation (str, optional): Minimum time between independent events as a
+            pandas timedelta string.
+        water_year_start (int, optional): First month of the water year for
+            ``"annual"`` (10 for October; 1 for calendar years).
+
+    Returns:
+        pd.DataFrame: One row per event, indexed by 'event', with columns
+        'time_peak_stor', 'peak_elev', 'start' and 'end' (bounds of the run or
+        water year the peak was taken from).
+
+    Raises:
+        ValueError: If ``method`` is unknown or ``threshold`` is missing.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}, not {method!r}")
+    values = elev.to_numpy(dtype=np.float64)
+    times = elev.index.values
+    separation = np.timedelta64(pd.Timedelta(separation))
+    n = len(values)
+
+    if method == "threshold":
+        if threshold is None:
+            raise ValueError("threshold is required for method='threshold'")
+        above = np.concatenate([[False], values > threshold, [False]])
+        change = np.diff(above.astype(np.int8))
+        starts = np.flatnonzero(change == 1)
+        ends = np.flatnonzero(change == -1)
+        if len(starts):
+            # Merge runs separated by less than the separation time
+            gaps = times[starts[1:]] - times[ends[:-1] - 1]
+            independent = np.concatenate([[True], gaps >= separation])
+            group = np.cumsum(independent) - 1
+            starts = starts[independent]
+            ends = ends[np.append(np.flatnonzero(np.diff(group)), len(group) - 1)]
+    else:
+        offset = (12 - water_year_start + 1) % 12
+        years = (elev.index + pd.DateOffset(months=offset)).year.to_numpy()
+        starts = np.flatnonzero(np.diff(years, prepend=years[0] - 1)) if n else np.array([], int)
+        ends = np.append(starts[1:], n)
+
+    if not len(starts):
+        peaks, positions = np.array([]), np.array([], dtype=int)
+    else:
+        peaks, positions = _segmentPeaks(values, starts, ends)
+    found = np.isfinite(peaks)
+    peaks, positions, starts, ends = peaks[found], positions[found], starts[found], ends[found]
+
+    if method == "annual" and len(peaks) > 1:
+        keep = np.ones(len(peaks), bool)
+        last = 0
+        for i in range(1, len(peaks)):
+            if times[positions[i]] - times[positions[last]] >= separation:
+                last = i
+            elif peaks[i] > peaks[last]:
+                keep[last] = False
+                last = i
+            else:
+                keep[i] = False
+        peaks, positions, starts, ends = peaks[keep], positions[keep], starts[keep], ends[keep]
+
+    return pd.DataFrame(
+        {
+            "time_peak_stor": times[positions],
+            "peak_elev": peaks,
+            "start": times[starts],
+            "end": times[ends - 1],
+        },
+        index=pd.RangeIndex(len(peaks), name="event"),
+    )
+
+
+def eventVolumeWindows(
+    df: pd.DataFrame,
+    events: pd.DataFrame,
+    ds_channel_capacity: float,
+    durations: List[int] = [1, 2, 3, 5, 7],
+    before: str = "10D",
+    after: str = "5D",
+) -> pd.DataFrame:
+    """
+    Computes volume windows and channel exceedance for every event at once.
+
+    Each event is analysed over ``[time_peak_stor - before, time_peak_stor + after]``,
+    as if that were the ``window`` of a single ``criticalDurationAnalysis``. For
+    a regular record the event windows are stacked into one (events x time)
+    array and every duration is one vectorized pass over all events.
+
+    Args:
+        df (pd.DataFrame): Record with 'flow' (inflow), 'outflow' and 'elev' columns.
+        events (pd.DataFrame): Events from ``detectEvents``.
+        ds_channel_capacity (float): Downstream channel capacity (cfs).
+        durations (List[int]): List of durations (in days).
+        before (str, optional): Analysis window before each peak.
+        after (str, optional): Analysis window after each peak.
+
+    Returns:
+        pd.DataFrame: Indexed by ('event', 'duration') with the columns of
+        ``getVolumeWindowSummary`` plus 'time_peak_stor' and
+        'time_ds_channel_exceed'. Durations that do not fit hold NaN / NaT.
+    """
+    times = df.index.values
+    before, after = np.timedelta64(pd.Timedelta(before)), np.timedelta64(pd.Timedelta(after))
+    peakTimes = events.time_peak_stor.to_numpy(dtype=times.dtype)
+    step = _regularStep(_timeSteps(times, df.attrs.get("interval")))
+
+    shape = (len(events), len(durations))
+    ratios = np.full(shape, np.nan)
+    max_flow = np.full(shape, np.nan)
+    window_start = np.full(shape, np.datetime64("NaT"), dtype=times.dtype)
+    window_end = window_start.copy()
+    exceed = np.full(len(events), np.datetime64("NaT"), dtype=times.dtype)
+
+    with stage("rolling_calc", durations=len(durations), events=len(events)) as s:
+        if step is not None and len(events):
+            stepSpan = np.timedelta64(int(step), "s")
+            lo, hi = int(before // stepSpan), int(after // stepSpan)
+            peakRows = np.searchsorted(times, peakTimes)
+            rows = peakRows[:, np.newaxis] + np.arange(-lo, hi + 1)
+            inRecord = (rows >= 0) & (rows < len(times))
+            rows = np.clip(rows, 0, len(times) - 1)
+            flow = np.where(inRecord, df.flow.to_numpy(dtype=np.float64)[rows], np.nan)
+            outflow = np.where(inRecord, df.outflow.to_numpy(dtype=np.float64)[rows], np.nan)
+
+            # Regular relative time axis shared by every event window
+            grid = np.arange(rows.shape[1]) * stepSpan.astype("timedelta64[ns]")
+            grid = np.datetime64(0, "ns") + grid
+            cs, nanCount = _flowPrefixSums(flow)
+            peakPos = np.full(len(events), lo + 1)
+            event = np.arange(len(events))
+            for j, n_day in enumerate(durations):
+                idx_max, beginPos, max_val, norm_vol = _durationWindows(
+                    cs, nanCount, grid, peakPos, n_day, step
+                )
+                ok = idx_max >= 0
+                ratios[ok, j] = norm_vol[ok]
+                max_flow[ok, j] = max_val[ok]
+                window_start[ok, j] = times[rows[event[ok], beginPos[ok]]]
+                window_end[ok, j] = times[rows[event[ok], idx_max[ok]]]
+
+            exceeds = outflow > ds_channel_capacity
+            first = exceeds.argmax(axis=1)
+            hit = exceeds.any(axis=1)
+            exceed[hit] = times[rows[event[hit], first[hit]]]
+        else:
+            for i, peak in enumerate(peakTimes):
+                part = df.loc[peak - before : peak + after]
+                for j, n_day in enumerate(durations):
+                    try:
+                        row = getVolumeWindowSummary(part, peak, [n_day]).iloc[0]
+                    except ValueError:
+                        continue
+                    ratios[i, j] = row.ratio
+                    max_flow[i, j] = row.max_flow
+                    window_start[i, j] = row.window_start
+                    window_end[i, j] = row.window_end
+                over = part.index[part.outflow > ds_channel_capacity]
+                if len(over):
+                    exceed[i] = over[0]
+        s.rows = len(times)
+
+    index = pd.MultiIndex.from_product(
+        [events.index, pd.Index(durations, dtype=np.int64)], names=["event", "duration"]
+    )
+    return pd.DataFrame(
+        {
+            "window_start": window_start.ravel(),
+            "window_end": window_end.ravel(),
+            "max_flow": max_flow.ravel(),
+            "ratio": ratios.ravel(),
+            "time_peak_stor": np.repeat(peakTimes, len(durations)),
+            "time_ds_channel_exceed": np.repeat(exceed, len(durations)),
+        },
+        index=index,
+    )
+
+
+def getEventVolumeWindows(
+    dss_file: str,
+    pathFlowIn: str,
+    pathFlowOut: str,
+    pathElev: str,
+    window: Tuple[str, str],
+    ds_channel_capacity: float,
+    durations: List[int] = [1, 2, 3, 5, 7],
+    method: str = "annual",
+    threshold: float = None,
+    separation: str = "7D",
+    before: str = "10D",
+    after: str = "5D",
+    session: DssSession = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Reads a period of record once and evaluates every flood event in it.
+
+    Args:
+        dss_file (str): Path to the DSS file.
+        pathFlowIn (str): DSS path for inflow data.
+        pathFlowOut (str): DSS path for outflow data.
+        pathElev (str): DSS path for elevation data.
+        window (Tuple[str, str]): Period of record to read (start, end).
+        ds_channel_capacity (float): Downstream channel capacity (cfs).
+        durations (List[int]): List of durations (in days).
+        method, threshold, separation: Event detection; see ``detectEvents``.
+        before, after: Analysis window around each peak; see ``eventVolumeWindows``.
+        session (DssSession, optional): Open session to read from.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: Events as ``detectEvents`` and volume
+        windows as ``eventVolumeWindows``.
+    """
+    if session is None:
+        with DssSession(dss_file) as session:
+            return getEventVolumeWindows(
+                dss_file,
+                pathFlowIn,
+                pathFlowOut,
+                pathElev,
+                window,
+                ds_channel_capacity,
+                durations,
+                method,
+                threshold,
+                separation,
+                before,
+                after,
+                session,
+            )
+
+    df = session.read_many(
+        {"flow": pathFlowIn, "outflow": pathFlowOut, "elev": pathElev}, window
+    )
+    df.attrs["interval"] = intervalSeconds(pathFlowIn.split("/")[5])
+    with stage("peak_detection") as s:
+        events = detectEvents(df.elev, method, threshold, separation)
+        s.rows = len(df)
+    return events, eventVolumeWindows(
+        df, events, ds_channel_capacity, durations, before, after
+    )
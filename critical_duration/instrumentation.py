@@ -0,0 +1,148 @@
+import contextvars
+import json
+import logging
+import os
+import time
+import tracemalloc
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_scenario: contextvars.ContextVar = contextvars.ContextVar("scenario", default=None)
+_tracer: Optional["Tracer"] = None
+
+
+class Tracer:
+    """
+    Receives one record per timed stage and emits it as JSON.
+
+    Records carry the stage name, scenario label, wall time in seconds, the
+    number of rows processed (when the stage reports it) and, if ``memory`` is
+    set, the peak traced allocation during the stage in bytes.
+
+    Args:
+        path (str, optional): JSON-lines file that records are appended to. Appends
+            are one line per write, so several worker processes can share a file.
+        log (bool, optional): Also emit each record through the
+            ``critical_duration.instrumentation`` logger at DEBUG level.
+        memory (bool, optional): Track peak memory with ``tracemalloc``. This slows
+            the traced code down noticeably.
+    """
+
+    def __init__(self, path: str = None, log: bool = True, memory: bool = False):
+        self.path = path
+        self.log = log
+        self.memory = memory
+        if path is not None and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def emit(self, record: dict) -> None:
+        line = json.dumps(record, default=str)
+        if self.log:
+            logger.debug(line)
+        if self.path is not None:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+class stage:
+    """
+    Times a pipeline stage when tracing is enabled; does nothing otherwise.
+
+    Use as a context manager and optionally report the rows processed::
+
+        with stage("dss_read") as s:
+            df = ...
+            s.rows = len(df)
+
+    Args:
+        name (str): Stage name, e.g. 'dss_open', 'dss_read', 'peak_detection',
+            'rolling_calc', 'plot' or 'save'.
+        **fields: Extra values to include in the record.
+    """
+
+    __slots__ = ("name", "fields", "rows", "_tracer", "_start")
+
+    def __init__(self, name: str, **fields):
+        self.name = name
+        self.fields = fields
+        self.rows = None
+        self._tracer = _tracer
+
+    def __enter__(self) -> "stage":
+        if self._tracer is not None:
+            if self._tracer.memory:
+                tracemalloc.reset_peak()
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, exc, tb) -> None:
+        tracer = self._tracer
+        if tracer is None:
+            return
+        record = {
+            "stage": self.name,
+            "scenario": _scenario.get(),
+            "seconds": time.perf_counter() - self._start,
+            "rows": self.rows,
+            "pid": os.getpid(),
+        }
+        if tracer.memory:
+            record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        if excType is not None:
+            record["error"] = excType.__name__
+        record.update(self.fields)
+        tracer.emit(record)
+
+
+class traceScenario:
+    """
+    Labels the stages run inside the block with a scenario name.
+
+    Args:
+        label (str): Scenario label, e.g. 'TERMINUS_2023_0.50'.
+    """
+
+    __slots__ = ("label", "_token")
+
+    def __init__(self, label: str):
+        self.label = label
+
+    def __enter__(self) -> "traceScenario":
+        self._token = _scenario.set(self.label)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _scenario.reset(self._token)
+
+
+def enableTracing(path: str = None, log: bool = True, memory: bool = False) -> Tracer:
+    """
+    Turns on stage tracing for this process.
+
+    Args:
+        path (str, optional): JSON-lines trace file; see ``Tracer``.
+        log (bool, optional): Also emit records through ``logging`` at DEBUG level.
+        memory (bool, optional): Record peak memory per stage.
+
+    Returns:
+        Tracer: The active tracer.
+    """
+    global _tracer
+    _tracer = Tracer(path, log, memory)
+    return _tracer
+
+
+def disableTracing() -> None:
+    """Turns stage tracing off. Stages then cost a single attribute check."""
+    global _tracer
+    if _tracer is not None and _tracer.memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _tracer = None
+
+
+def activeTracer() -> Optional[Tracer]:
+    """Returns the active tracer, or None when tracing is off."""
+    return _tracer
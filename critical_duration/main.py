@@ -1,7 +1,16 @@
-from critical_duration.data_processing import getVolumeWindowData, getCriticalDurationPlotData
-from critical_duration.plotting import plot_volume_window
+from critical_duration.data_processing import (
+    VolumeWindowRecords,
+    getVolumeWindowData,
+    getVolumeWindowSummary,
+    volumeWindowChartData,
+    volumeWindowPlotData,
+)
+from critical_duration.cache import ResultCache
+from critical_duration.dss import DssSession
+from critical_duration.plotting import PlotRenderer, plot_volume_window
+from critical_duration.instrumentation import stage, traceScenario
 import pandas as pd
-from typing import Tuple, List
+from typing import Tuple, List, Union
 import os
 
 def criticalDurationAnalysis(
@@ -15,78 +24,81 @@ def criticalDurationAnalysis(
     scale_factor: float,
     reservoir:str,
     outputDirectory:str,
-    durations: List[int]
+    durations: List[int],
+    session: DssSession = None,
+    result_cache: ResultCache = None,
+    render_plots: Union[str, PlotRenderer] = "inline",
+    compact: bool = False,
+    records: VolumeWindowRecords = None,
 )-> pd.DataFrame:
     
-    # Get volume window data
-    df, criticalTimes = getVolumeWindowData(
-        dss_file,
-        scale_factor,
-        year,
-        ds_channel_capacity,
-        pathFlowIn,
-        pathFlowOut,
-        pathElev,
-        window
-    )
-
-    # Calculate volume window volumes
-    df = getCriticalDurationPlotData(df, criticalTimes.time_peak_stor, durations)
-
-    plotWindow = [
-        df.date.min().date().strftime("%Y-%m-%d"),
-        (df.date.max().date() + pd.Timedelta("3Day")).strftime("%Y-%m-%d"),
-    ]
-    # Plot volume window
-    vw_plot = plot_volume_window(df, plotWindow)
-    plotDirectory = rf"{outputDirectory}\VolumeWindowPlots"
-    os.makedirs(plotDirectory, exist_ok=True)
-    # Save the plot to png file
-    vw_plot.save(
-        rf"{plotDirectory}\{reservoir}_{year}_{scale_factor:.2f}_volume_window.png"
-    )
-
-    df = df.loc[df.metric != "flow", :]
-    df.loc[:, "scale_factor"] = scale_factor
-
-    return df
-
-if __name__ == "__main__":
-
-
-    # Assign arguments to variables
-    dss_file = "data/Terminus_Data.dss"
-    reservoir = "TERMINUS"
-    year = 2023
-    ds_channel_capacity = 5500
-    window = tuple("01Dec2021 01:00, 10Dec2021 02:00".split(","))
-    scaleFactors = list(range(5, 201, 5))
-    collectionIDs = list(range(1, 41))
-    durations = [1, 2, 3, 5, 7]
-    outputDirectory = "outputs"
-
-    output = pd.DataFrame()
-    for collectionID, scaleFactor in zip(collectionIDs[1:], scaleFactors[1:]):
-        scaleFactor = scaleFactor / 100
-
-        pathFlowIn = f"//TRM-TRM INFLOW-KAWEAH/FLOW//1HOUR/C:0000{str(collectionID).zfill(2)}|EXISTING C:{year}_SDI D:RESSIM-FRA SHIFT/"
-        pathFlowOut = f"//TRM-TRM OUTFLOW-KAWEAH/FLOW//1HOUR/C:0000{str(collectionID).zfill(2)}|EXISTING C:{year}_SDI D:RESSIM-FRA SHIFT/"
-        pathElev = f"//TERMINUS DAM-POOL/ELEV//1HOUR/C:0000{str(collectionID).zfill(2)}|EXISTING C:{year}_SDI D:RESSIM-FRA SHIFT/"
-
-        df = criticalDurationAnalysis(
+    with traceScenario(f"{reservoir}_{year}_{scale_factor:.2f}"):
+        # Get volume window data
+        df, criticalTimes = getVolumeWindowData(
             dss_file,
+            scale_factor,
             year,
             ds_channel_capacity,
             pathFlowIn,
             pathFlowOut,
             pathElev,
             window,
-            scaleFactor,
-            reservoir,
-            outputDirectory,
-            durations
+            session,
+            records,
+        )
+
+        # Calculate volume window volumes
+        summary = getVolumeWindowSummary(
+            df, criticalTimes.time_peak_stor, durations, result_cache
         )
 
-        output = pd.concat([output, df])
+        renderer = render_plots
+        if not isinstance(renderer, PlotRenderer):
+            if render_plots in ("deferred", "faceted"):
+                raise ValueError(
+                    f"Pass a PlotRenderer({render_plots!r}) to collect {render_plots} plots"
+                )
+            renderer = PlotRenderer(render_plots)
+
+        plotData = None
+        if not compact:
+            plotData = volumeWindowPlotData(df, summary)
+
+        if renderer.mode != "off":
+            chartData = volumeWindowChartData(df, summary)
+            plotDirectory = rf"{outputDirectory}\VolumeWindowPlots"
+            os.makedirs(plotDirectory, exist_ok=True)
+            if renderer.mode == "faceted":
+                # One chart for every scale factor of the reservoir and year
+                renderer.submit(
+                    chartData.assign(scenario=f"{scale_factor:.2f}"),
+                    rf"{plotDirectory}\{reservoir}_{year}_volume_windows.png",
+                )
+            else:
+                plotWindow = [
+                    df.index.min().date().strftime("%Y-%m-%d"),
+                    (df.index.max().date() + pd.Timedelta("3Day")).strftime("%Y-%m-%d"),
+                ]
+                # Plot volume window
+                with stage("plot") as s:
+                    vw_plot = plot_volume_window(chartData, plotWindow)
+                    s.rows = len(chartData)
+                # Save the plot to png file, now or when the renderer is flushed
+                renderer.submit(
+                    vw_plot,
+                    rf"{plotDirectory}\{reservoir}_{year}_{scale_factor:.2f}_volume_window.png",
+                )
+
+        if compact:
+            df = summary.reset_index()
+        else:
+            df = plotData.loc[plotData.metric != "flow", :]
+        df.loc[:, "scale_factor"] = scale_factor
+
+        return df
+
+if __name__ == "__main__":
+    import sys
+    from critical_duration.cli import main
 
-    output.to_excel(rf"outputs/{reservoir}_{year}_critical_duration_summary.xlsx")
\ No newline at end of file
+    sys.exit(main(["run", "studies/terminus_2023.toml", "--workers", "1"]))
@@ -1,73 +1,232 @@
-import altair as alt
-from altair import Chart, datum
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Tuple
+import pandas as pd
+from .data_processing import compactPlotData
+from .instrumentation import stage
 
-# Disable maximum row limit for Altair and enable browser rendering
-alt.data_transformers.disable_max_rows()
-alt.renderers.enable("browser")
+if TYPE_CHECKING:
+    import altair as alt
 
-def plot_volume_window(df, window):
+_alt = None
+
+# Row limit for data embedded in a chart; a compact 40-scenario facet chart is
+# about 20,000 rows
+_MAX_CHART_ROWS = 50_000
+
+
+def _hasDisplay() -> bool:
+    """True when charts can be opened in a browser (not a headless Linux session)."""
+    if sys.platform in ("win32", "darwin"):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def _altair():
+    """
+    Imports and configures Altair on first use.
+
+    Altair is only loaded when a chart is built, so compute-only runs never pay
+    its import cost. The browser renderer is enabled only when a display is
+    available.
+    """
+    global _alt
+    if _alt is None:
+        import altair as alt
+
+        # Chart data is compacted before it is embedded, so a bounded row limit
+        # still guards against a full record slipping into a spec
+        alt.data_transformers.enable("default", max_rows=_MAX_CHART_ROWS)
+        if _hasDisplay():
+            alt.renderers.enable("browser")
+        _alt = alt
+    return _alt
+
+
+def _volumeWindowLayers(alt, window, yMax: float) -> Tuple:
+    """Flow line, window segment and label layers that share their parent's data."""
+    datum = alt.datum
+    y = alt.Y("flow:Q").axis(title="Flow [cfs]").scale(domain=[0, yMax])
+    x = alt.X("date:T").scale(domain=window).axis(title="Date")
+
+    # Decimated flow trace
+    line = (
+        alt.Chart()
+        .mark_line(color="black", strokeWidth=1)
+        .encode(x=x, y=y)
+        .transform_filter(datum.metric == "flow")
+    )
+
+    # Two-point segment per n-day window
+    segments = (
+        alt.Chart()
+        .mark_line(strokeWidth=2)
+        .encode(x=x, y=y, color=alt.Color("metric:N"))
+        .transform_filter(datum.metric != "flow")
+    )
+
+    # Normalized volume label at the end of each window
+    labels = (
+        alt.Chart()
+        .mark_text(align="left", baseline="middle", dx=10)
+        .encode(
+            x=x,
+            y=y,
+            color=alt.Color("metric:N"),
+            text=alt.Text("text:Q", format=".1%"),
+        )
+        .transform_filter("isValid(datum.text)")
+    )
+    return line, segments, labels
+
+
+def plot_volume_window(df, window, buckets: int = 1000):
     """
     Creates an interactive Altair plot to visualize flow data and n-day rolling volumes.
 
     Args:
-        df (pd.DataFrame): DataFrame containing flow data and rolling volume metrics.
+        df (pd.DataFrame): DataFrame containing flow data and rolling volume metrics,
+                           from ``volumeWindowChartData`` or ``volumeWindowPlotData``.
                            Expected columns:
                            - 'date': Timestamps for the data points.
                            - 'flow': Flow values (cfs).
                            - 'metric': Metric type (e.g., 'flow', '1-day', '2-day', etc.).
                            - 'text': Normalized volume values for display.
         window (Tuple[str, str]): Time window for the x-axis (start, end).
+        buckets (int, optional): Flow trace buckets; see ``compactPlotData``.
 
     Returns:
         alt.LayerChart: An interactive Altair chart combining:
                         - A line plot for flow data.
-                        - Bar plots for n-day rolling volumes.
+                        - Line segments for n-day rolling volumes.
                         - Text annotations for normalized volume values.
 
     Notes:
-        - The function uses Altair's `Chart` to create layered visualizations.
+        - The data is compacted with ``compactPlotData`` and embedded once, at the
+          top level, for all three layers.
         - The `datum.metric` field is used to differentiate between flow data and rolling volumes.
         - The plot is interactive, allowing zooming and panning.
     """
-    # Base line chart for flow data
-    base = (
-        Chart(df)
-        .mark_line(color="black", strokeWidth=1)
-        .encode(
-            x=alt.X("date:T").scale(domain=window).axis(title="Date"),
-            y=alt.Y("flow").axis(title="Flow [cfs]").scale(domain=[0, df.flow.max()]),
-        )
-        .transform_filter(datum.metric == "flow")
-    )
+    alt = _altair()
+    data = compactPlotData(df, buckets)
+    line, segments, labels = _volumeWindowLayers(alt, window, data.flow.max())
+    return alt.layer(line, segments, labels, data=data).interactive()
 
-    # Bar chart for n-day rolling volumes
-    rule = (
-        Chart(df)
-        .mark_bar(height=2)
-        .encode(
-            x="min(date):T",
-            x2="max(date):T",
-            y=alt.Y("flow").scale(domain=[0, df.flow.max()]),
-            color="metric",
-        )
-        .transform_filter(datum.metric != "flow")
-    )
 
-    # Text annotations for normalized volume values
-    tex = (
-        Chart(df)
-        .mark_text(align="left", baseline="middle", dx=10)
-        .encode(
-            x="max(date):T",
-            y=alt.Y(
-                "flow",
-                aggregate={"argmax": "date"},
-            ).scale(domain=[0, df.flow.max()]),
-            color="metric",
-            text=alt.Text("text", format=".1%"),
-        )
-        .transform_filter(datum.metric != "flow")
+def plot_volume_windows(
+    df, window=None, facet: str = "scenario", columns: int = 4, buckets: int = 125
+):
+    """
+    Creates one faceted chart of the volume windows of many scenarios.
+
+    Args:
+        df (pd.DataFrame): Chart data of every scenario (see ``plot_volume_window``)
+            with a ``facet`` column naming the scenario of each row.
+        window (Tuple[str, str], optional): Time window for the x-axis; defaults to
+            the dates of ``df``.
+        facet (str, optional): Column to facet by.
+        columns (int, optional): Facets per row.
+        buckets (int, optional): Flow trace buckets per scenario.
+
+    Returns:
+        alt.FacetChart: One panel per scenario with shared axes, embedding a single
+        compact dataset.
+    """
+    alt = _altair()
+    data = pd.concat(
+        [
+            compactPlotData(group, buckets).assign(**{facet: name})
+            for name, group in df.groupby(facet, sort=False)
+        ],
+        ignore_index=True,
+    )
+    if window is None:
+        window = [data.date.min().isoformat(), data.date.max().isoformat()]
+    line, segments, labels = _volumeWindowLayers(alt, window, data.flow.max())
+    return (
+        alt.layer(line, segments, labels)
+        .properties(width=250, height=150)
+        .facet(facet=alt.Facet(f"{facet}:N"), columns=columns, data=data)
     )
 
-    # Combine all layers and make the chart interactive
-    return (base + rule + tex).interactive()
\ No newline at end of file
+
+def _save(chart: "alt.TopLevelMixin", path: str) -> None:
+    with stage("save", path=path):
+        chart.save(path)
+
+
+class PlotRenderer:
+    """
+    Saves volume window charts according to a rendering mode.
+
+    Modes:
+        - ``"off"``: charts are neither built nor saved (headless summary runs).
+        - ``"inline"``: each chart is saved as soon as it is submitted.
+        - ``"deferred"``: charts are queued and saved together by ``flush``,
+          on a background thread pool.
+        - ``"faceted"``: chart data with a 'scenario' column is queued instead of
+          a chart, and ``flush`` saves one ``plot_volume_windows`` chart per path.
+
+    Args:
+        mode (str, optional): One of ``"off"``, ``"inline"``, ``"deferred"`` or
+            ``"faceted"``.
+        workers (int, optional): Number of threads used by ``flush``.
+
+    Raises:
+        ValueError: If ``mode`` is not a known rendering mode.
+    """
+
+    MODES = ("off", "inline", "deferred", "faceted")
+
+    def __init__(self, mode: str = "inline", workers: int = None):
+        if mode not in self.MODES:
+            raise ValueError(f"render mode must be one of {self.MODES}, not {mode!r}")
+        self.mode = mode
+        self.workers = workers
+        self.pending: List[Tuple["alt.TopLevelMixin", str]] = []
+
+    def submit(self, chart: "alt.TopLevelMixin", path: str) -> None:
+        """
+        Saves ``chart`` to ``path`` now, queues it, or drops it, depending on the mode.
+
+        Args:
+            chart (alt.TopLevelMixin): Chart to save, or chart data of one scenario
+                in ``"faceted"`` mode.
+            path (str): Output file; the format follows the extension.
+        """
+        if self.mode == "inline":
+            _save(chart, path)
+        elif self.mode in ("deferred", "faceted"):
+            self.pending.append((chart, path))
+
+    def flush(self) -> Dict[str, Exception]:
+        """
+        Saves every queued chart and empties the queue.
+
+        In ``"faceted"`` mode the queued chart data is first combined into one
+        chart per path. A chart that fails to save does not stop the others.
+
+        Returns:
+            Dict[str, Exception]: Errors keyed by the path of each chart that could
+            not be saved; empty when all were saved.
+        """
+        pending, self.pending = self.pending, []
+        if not pending:
+            return {}
+        if self.mode == "faceted":
+            frames: Dict[str, List[pd.DataFrame]] = {}
+            for data, path in pending:
+                frames.setdefault(path, []).append(data)
+            pending = [
+                (plot_volume_windows(pd.concat(data, ignore_index=True)), path)
+                for path, data in frames.items()
+            ]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(_save, chart, path) for chart, path in pending]
+        return {
+            path: future.exception()
+            for (_, path), future in zip(pending, futures)
+            if future.exception() is not None
+        }
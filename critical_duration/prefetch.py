@@ -0,0 +1,101 @@
+import queue
+import threading
+import traceback
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+class Prefetched(NamedTuple):
+    """
+    One item with what ``load`` returned for it, or the error that stopped it.
+    """
+
+    item: object
+    value: object
+    error: Optional[str]
+
+
+def prefetchItems(
+    items: Iterable[T], load: Callable[[T], R], depth: int = 2
+) -> Iterator[Prefetched]:
+    """
+    Loads items on a background thread while the caller works on earlier ones.
+
+    ``load`` runs on one background thread, in order, and its results wait in a
+    queue of ``depth`` entries. Once the queue is full the thread blocks until the
+    caller takes the next result, so at most ``depth`` loaded results plus the
+    one being loaded and the one being used are held at a time. Use it to
+    overlap DSS reads (which spend their time in I/O) with the computation on
+    the previous scenario in a single process.
+
+    Args:
+        items (Iterable[T]): Items to load, e.g. scenarios.
+        load (Callable[[T], R]): Function run on the background thread for each item.
+        depth (int, optional): Number of loaded items that may wait for the caller.
+
+    Yields:
+        Prefetched: Results in the order of ``items``. An exception raised by
+        ``load`` is returned as the formatted traceback in ``error`` and the
+        remaining items are still loaded.
+
+    Raises:
+        ValueError: If ``depth`` is less than 1.
+        Exception: Whatever iterating ``items`` raised, once the items before it
+            have been yielded.
+
+    Notes:
+        - ``load`` must not share non-thread-safe state with the caller; a DSS
+          session used by ``load`` should not be read from the calling thread
+          until the iterator is exhausted or closed.
+        - Closing the iterator early (e.g. ``break``) stops the thread after the
+          item it is loading.
+    """
+    if depth < 1:
+        raise ValueError(f"depth must be at least 1, not {depth}")
+    results: "queue.Queue" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    failures = []
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                results.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker() -> None:
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                try:
+                    entry = Prefetched(item, load(item), None)
+                except Exception:
+                    entry = Prefetched(item, None, traceback.format_exc())
+                if not put(entry):
+                    return
+        except BaseException as exc:
+            # Iterating ``items`` failed; re-raised in the calling thread
+            failures.append(exc)
+        finally:
+            put(_DONE)
+
+    thread = threading.Thread(target=worker, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            entry = results.get()
+            if entry is _DONE:
+                if failures:
+                    raise failures[0]
+                return
+            yield entry
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,451 @@
+import glob
+import json
+import os
+import sqlite3
+import pandas as pd
+from typing import List, Optional, Sequence, Tuple, Union
+
+_DATE_COLUMNS = ["date", "window_start", "window_end"]
+
+
+class ResultWriter:
+    """
+    Streams scenario results to chunk files as they finish.
+
+    Each ``append`` writes one CSV or Parquet chunk to ``directory``, so memory
+    stays flat over long sweeps and everything finished before a crash is kept
+    on disk. ``read`` and ``to_excel`` combine the chunks once at the end.
+    ``appendCharts`` keeps a scenario's chart data next to its chunk, so charts
+    drawn over every scenario can be rebuilt by a run that skips some of them.
+
+    Args:
+        directory (str): Directory holding the chunk files.
+        format (str, optional): Chunk format, ``"csv"`` or ``"parquet"`` (requires
+            pyarrow or fastparquet).
+        overwrite (bool, optional): Delete chunks left by a previous run instead of
+            continuing after them.
+
+    Raises:
+        ValueError: If ``format`` is not supported.
+    """
+
+    FORMATS = ("csv", "parquet")
+
+    def __init__(self, directory: str, format: str = "csv", overwrite: bool = False):
+        if format not in self.FORMATS:
+            raise ValueError(f"format must be one of {self.FORMATS}, not {format!r}")
+        self.directory = directory
+        self.format = format
+        os.makedirs(directory, exist_ok=True)
+        if overwrite:
+            for chunk in self.chunks() + self._chartFiles():
+                os.remove(chunk)
+        self._count = len(self.chunks())
+
+    def chunks(self) -> List[str]:
+        """Returns the chunk files written so far, in order."""
+        return sorted(glob.glob(os.path.join(self.directory, f"part-*.{self.format}")))
+
+    def _chunk(self, name: str) -> str:
+        return os.path.join(self.directory, f"part-{name}.{self.format}")
+
+    def _charts(self, name: str) -> str:
+        return os.path.join(self.directory, f"charts-{name}.{self.format}")
+
+    def _chartFiles(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, f"charts-*.{self.format}")))
+
+    def _write(self, df: pd.DataFrame, path: str) -> None:
+        tmp = f"{path}.tmp"
+        if self.format == "csv":
+            df.to_csv(tmp)
+        else:
+            df.to_parquet(tmp)
+        os.replace(tmp, path)
+
+    def names(self) -> List[str]:
+        """Returns the names of the chunks written so far, in order."""
+        suffix = f".{self.format}"
+        return [
+            os.path.basename(chunk)[len("part-") : -len(suffix)] for chunk in self.chunks()
+        ]
+
+    def chartNames(self) -> List[str]:
+        """Returns the names of the chunks whose chart data is kept, in order."""
+        suffix = f".{self.format}"
+        return [
+            os.path.basename(charts)[len("charts-") : -len(suffix)]
+            for charts in self._chartFiles()
+        ]
+
+    def remove(self, name: str) -> None:
+        """Deletes the chunk named ``name`` and its chart data, if they exist."""
+        for path in [self._chunk(name), self._charts(name)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def prune(self, names: Sequence[str]) -> List[str]:
+        """
+        Deletes every chunk whose name is not in ``names``.
+
+        Args:
+            names (Sequence[str]): Names of the chunks to keep.
+
+        Returns:
+            List[str]: Names of the deleted chunks.
+        """
+        keep = set(names)
+        stale = [
+            name
+            for name in sorted(set(self.names()) | set(self.chartNames()))
+            if name not in keep
+        ]
+        for name in stale:
+            self.remove(name)
+        return stale
+
+    def append(self, df: pd.DataFrame, name: str = None) -> str:
+        """
+        Writes ``df`` as a new chunk.
+
+        Args:
+            df (pd.DataFrame): Result rows to write.
+            name (str, optional): Chunk name, used to order chunks independently of
+                completion order (e.g. a zero-padded scenario index). Defaults to a
+                running counter. Writing the same name again replaces that chunk.
+
+        Returns:
+            str: Path of the chunk file.
+        """
+        if name is None:
+            name = f"{self._count:06d}"
+        chunk = self._chunk(name)
+        self._write(df, chunk)
+        self._count += 1
+        return chunk
+
+    def appendCharts(self, charts: Sequence[Tuple[pd.DataFrame, str]], name: str) -> None:
+        """
+        Keeps the chart data of the chunk named ``name``.
+
+        Args:
+            charts (Sequence[Tuple[pd.DataFrame, str]]): (chart data, output path)
+                pairs, as queued by a ``"faceted"`` ``PlotRenderer``.
+            name (str): Chunk name. Writing the same name again replaces the data.
+        """
+        frames = [data.assign(path=path) for data, path in charts]
+        if frames:
+            self._write(pd.concat(frames, ignore_index=True), self._charts(name))
+
+    def readCharts(self, names: Sequence[str]) -> List[Tuple[pd.DataFrame, str]]:
+        """
+        Reads back the chart data kept by ``appendCharts``.
+
+        Args:
+            names (Sequence[str]): Chunk names; names without chart data are skipped.
+
+        Returns:
+            List[Tuple[pd.DataFrame, str]]: (chart data, output path) pairs, in the
+            order of ``names``.
+        """
+        charts = []
+        for name in names:
+            path = self._charts(name)
+            if not os.path.exists(path):
+                continue
+            if self.format == "csv":
+                # Facet labels such as "0.50" must stay text
+                df = pd.read_csv(path, index_col=0, dtype={"scenario": str, "path": str})
+                df["date"] = pd.to_datetime(df["date"])
+            else:
+                df = pd.read_parquet(path)
+            for output, data in df.groupby("path", sort=False):
+                charts.append((data.drop(columns="path").reset_index(drop=True), output))
+        return charts
+
+    def read(self) -> pd.DataFrame:
+        """
+        Combines every chunk into one DataFrame.
+
+        Returns:
+            pd.DataFrame: All rows written so far, in chunk order.
+        """
+        frames = []
+        for chunk in self.chunks():
+            if self.format == "csv":
+                df = pd.read_csv(chunk, index_col=0)
+                for col in _DATE_COLUMNS:
+                    if col in df.columns:
+                        df[col] = pd.to_datetime(df[col])
+            else:
+                df = pd.read_parquet(chunk)
+            frames.append(df)
+        return pd.concat(frames) if frames else pd.DataFrame()
+
+    def to_excel(self, path: str) -> None:
+        """
+        Exports every chunk to a single Excel workbook.
+
+        Args:
+            path (str): Output ``.xlsx`` file.
+        """
+        self.read().to_excel(path)
+
+
+class Checkpoint:
+    """
+    Records which scenarios of a run finished, so a restarted run can skip them.
+
+    One small JSON file per scenario is written to ``directory`` after its
+    results are safely on disk. Each entry stores a key describing the
+    scenario's inputs; a scenario counts as done only while its key is
+    unchanged, so edited scenarios are rerun.
+
+    Args:
+        directory (str): Directory holding the checkpoint files.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.json")
+
+    def key(self, name: str) -> Optional[str]:
+        """Returns the key recorded for ``name``, or None if it has not finished."""
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)["key"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def done(self, name: str, key: str) -> bool:
+        """True if ``name`` finished with the same inputs (``key``)."""
+        return self.key(name) == key
+
+    def mark(self, name: str, key: str) -> None:
+        """
+        Records that ``name`` finished.
+
+        Args:
+            name (str): Scenario name, e.g. its result chunk name.
+            key (str): Key describing the scenario's inputs.
+        """
+        path = self._path(name)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"key": key}, f)
+        os.replace(tmp, path)
+
+    def discard(self, name: str) -> None:
+        """Forgets that ``name`` finished."""
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def prune(self, names: Sequence[str]) -> None:
+        """Forgets every finished scenario whose name is not in ``names``."""
+        keep = set(names)
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            if os.path.basename(path)[: -len(".json")] not in keep:
+                os.remove(path)
+
+    def clear(self) -> None:
+        """Forgets every finished scenario."""
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            os.remove(path)
+
+
+_STORE_COLUMNS = [
+    "reservoir",
+    "year",
+    "scale_factor",
+    "duration",
+    "window_start",
+    "window_end",
+    "max_flow",
+    "ratio",
+]
+_STORE_KEY = ["reservoir", "year", "scale_factor", "duration"]
+_STORE_TYPES = {
+    "reservoir": str,
+    "year": int,
+    "scale_factor": lambda value: round(float(value), 6),
+    "duration": int,
+}
+
+
+def _durationRows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per scale factor and duration from ``criticalDurationAnalysis`` output,
+    in either its compact (summary) or long (window rows) layout.
+    """
+    if "duration" in df.columns:
+        return df[_STORE_COLUMNS[2:]]
+    rows = (
+        df.groupby(["scale_factor", "metric"], sort=False)
+        .agg(
+            window_start=("date", "min"),
+            window_end=("date", "max"),
+            max_flow=("flow", "first"),
+            ratio=("text", "first"),
+        )
+        .reset_index()
+    )
+    rows.insert(1, "duration", rows.pop("metric").str.split("-").str[0].astype(int))
+    return rows
+
+
+class ResultStore:
+    """
+    Keeps volume window results of every reservoir, year and scale factor in one
+    indexed SQLite file.
+
+    Each scenario's rows are upserted as it finishes, keyed on (reservoir, year,
+    scale_factor, duration), so rerunning a scenario replaces its rows and
+    results from many runs and studies accumulate in one place. ``query``
+    returns any slice, e.g. every 3-day ratio of one reservoir across years,
+    as a DataFrame without reading spreadsheets back.
+
+    Args:
+        path (str): SQLite database file; created if missing.
+
+    Notes:
+        - Scale factors are stored rounded to 6 decimals so that keys computed
+          as ``percent / 100`` match the values passed to ``query``.
+        - Use one store per process; readers in other processes see committed
+          upserts.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS volume_windows (
+                    reservoir TEXT NOT NULL,
+                    year INTEGER NOT NULL,
+                    scale_factor REAL NOT NULL,
+                    duration INTEGER NOT NULL,
+                    window_start INTEGER,
+                    window_end INTEGER,
+                    max_flow REAL,
+                    ratio REAL,
+                    PRIMARY KEY (reservoir, year, scale_factor, duration)
+                )
+                """
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS volume_windows_duration "
+                "ON volume_windows (reservoir, duration, year)"
+            )
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        self._db.close()
+
+    def upsert(self, reservoir: str, year: int, df: pd.DataFrame) -> int:
+        """
+        Inserts or replaces the results of one or more scenarios.
+
+        Args:
+            reservoir (str): Reservoir name.
+            year (int): Year of the analysis.
+            df (pd.DataFrame): ``criticalDurationAnalysis`` output with a
+                'scale_factor' column, compact or long.
+
+        Returns:
+            int: Number of (scale factor, duration) rows written.
+        """
+        rows = _durationRows(df)
+        records = zip(
+            [str(reservoir)] * len(rows),
+            [int(year)] * len(rows),
+            rows.scale_factor.astype(float).round(6).tolist(),
+            rows.duration.astype(int).tolist(),
+            pd.to_datetime(rows.window_start).astype("int64").tolist(),
+            pd.to_datetime(rows.window_end).astype("int64").tolist(),
+            rows.max_flow.astype(float).tolist(),
+            rows.ratio.astype(float).tolist(),
+        )
+        with self._db:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO volume_windows ({', '.join(_STORE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_STORE_COLUMNS))})",
+                records,
+            )
+        return len(rows)
+
+    def delete(
+        self, reservoir: str, year: int = None, scale_factor: float = None
+    ) -> None:
+        """Removes the results of a reservoir, one of its years, or one scale factor."""
+        where, params = self._where(
+            reservoir=reservoir, year=year, scale_factor=scale_factor
+        )
+        with self._db:
+            self._db.execute(f"DELETE FROM volume_windows{where}", params)
+
+    @staticmethod
+    def _where(**filters) -> Tuple[str, list]:
+        clauses, params = [], []
+        for column, value in filters.items():
+            if value is None:
+                continue
+            values = [value] if pd.api.types.is_scalar(value) else list(value)
+            values = [_STORE_TYPES[column](v) for v in values]
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(
+        self,
+        reservoir: Union[str, Sequence[str]] = None,
+        year: Union[int, Sequence[int]] = None,
+        scale_factor: Union[float, Sequence[float]] = None,
+        duration: Union[int, Sequence[int]] = None,
+    ) -> pd.DataFrame:
+        """
+        Returns the stored results matching every given filter.
+
+        Each filter takes one value or a sequence of values; omitted filters
+        match everything. For example ``query("TERMINUS", duration=3)`` returns
+        every 3-day window of TERMINUS across years and scale factors.
+
+        Args:
+            reservoir (str or Sequence[str], optional): Reservoir names.
+            year (int or Sequence[int], optional): Years.
+            scale_factor (float or Sequence[float], optional): Scale factors.
+            duration (int or Sequence[int], optional): Durations in days.
+
+        Returns:
+            pd.DataFrame: Columns 'reservoir', 'year', 'scale_factor', 'duration',
+            'window_start', 'window_end', 'max_flow' and 'ratio', ordered by the key.
+        """
+        where, params = self._where(
+            reservoir=reservoir, year=year, scale_factor=scale_factor, duration=duration
+        )
+        rows = self._db.execute(
+            f"SELECT {', '.join(_STORE_COLUMNS)} FROM volume_windows{where} "
+            f"ORDER BY {', '.join(_STORE_KEY)}",
+            params,
+        ).fetchall()
+        df = pd.DataFrame(rows, columns=_STORE_COLUMNS)
+        for col in ["window_start", "window_end"]:
+            df[col] = pd.to_datetime(df[col].astype("int64"), unit="ns")
+        return df
@@ -0,0 +1,367 @@
+import hashlib
+import json
+import logging
+import os
+import traceback
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from .cache import ResultCache, SeriesCache
+from .data_processing import VolumeWindowRecords, readVolumeWindowRecords
+from .dss import closeSessions, openSession
+from .instrumentation import Tracer, activeTracer, enableTracing, traceScenario
+from .main import criticalDurationAnalysis
+from .plotting import PlotRenderer
+from .prefetch import prefetchItems
+from .results import Checkpoint, ResultStore, ResultWriter
+
+logger = logging.getLogger(__name__)
+
+
+class Scenario(NamedTuple):
+    """
+    Arguments of one ``criticalDurationAnalysis`` call, in the same order.
+    """
+
+    dss_file: str
+    year: int
+    ds_channel_capacity: int
+    pathFlowIn: str
+    pathFlowOut: str
+    pathElev: str
+    window: Tuple[str, str]
+    scale_factor: float
+    reservoir: str
+    outputDirectory: str
+    durations: List[int]
+
+
+class ScenarioResult(NamedTuple):
+    """
+    Outcome of one scenario: the summary rows, or the error that stopped it.
+
+    ``plots`` holds the (chart, path) pairs queued when plots are deferred, or
+    (chart data, path) pairs when they are faceted.
+    """
+
+    scenario: Scenario
+    data: Optional[pd.DataFrame]
+    error: Optional[str]
+    plots: tuple = ()
+
+
+class ScenarioRun(NamedTuple):
+    """
+    Results of ``run_scenarios`` in input order, plus the combined summary.
+    """
+
+    output: pd.DataFrame
+    results: List[ScenarioResult]
+
+    @property
+    def failures(self) -> List[ScenarioResult]:
+        return [result for result in self.results if result.error is not None]
+
+
+def scenarioKey(scenario: Scenario, compact: bool = False) -> str:
+    """
+    Hash of a scenario's inputs, used by ``Checkpoint`` to detect changes.
+
+    Covers every argument, the output layout and the size and modification
+    time of the DSS file, so rewriting the DSS file reruns its scenarios.
+
+    Args:
+        scenario (Scenario): Scenario to describe.
+        compact (bool, optional): Whether compact summaries are written.
+
+    Returns:
+        str: Hex digest.
+    """
+    try:
+        stat = os.stat(scenario.dss_file)
+        fileState = [stat.st_mtime_ns, stat.st_size]
+    except OSError:
+        fileState = None
+    payload = json.dumps([list(scenario), compact, fileState], default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def scenarioName(scenario: Scenario) -> str:
+    """
+    Stable name of a scenario's result chunk and checkpoint.
+
+    Built from the scale factor and the three record paths, so it does not
+    depend on the scenario's position in a run: adding or removing collection
+    members leaves the names of the others unchanged. The scale factor is
+    zero-padded so that names (and so the chunks of a ``ResultWriter``) sort
+    by scale factor.
+
+    Args:
+        scenario (Scenario): Scenario to name.
+
+    Returns:
+        str: Name such as ``"00000.5000-1a2b3c4d"``.
+    """
+    paths = "|".join([scenario.pathFlowIn, scenario.pathFlowOut, scenario.pathElev])
+    digest = hashlib.sha1(paths.encode()).hexdigest()[:8]
+    return f"{scenario.scale_factor:010.4f}-{digest}"
+
+
+def _runScenario(
+    scenario: Scenario,
+    cache: SeriesCache = None,
+    result_cache: ResultCache = None,
+    render_plots: str = "inline",
+    compact: bool = False,
+    tracer: Tracer = None,
+    records: VolumeWindowRecords = None,
+) -> ScenarioResult:
+    """
+    Runs one scenario, reading through this process's pooled DSS handle.
+
+    Any exception is captured in the result so one bad scenario does not abort
+    the rest of the run. Deferred charts are returned with the result. A
+    ``tracer`` from the parent process turns on tracing in a pool worker, and
+    prefetched ``records`` (see ``_readScenario``) replace the DSS reads.
+    """
+    if tracer is not None and activeTracer() is None:
+        enableTracing(tracer.path, tracer.log, tracer.memory)
+    renderer = PlotRenderer(render_plots)
+    try:
+        session = openSession(scenario.dss_file, cache)
+        df = criticalDurationAnalysis(
+            *scenario,
+            session=session,
+            result_cache=result_cache,
+            render_plots=renderer,
+            compact=compact,
+            records=records,
+        )
+        return ScenarioResult(scenario, df, None, tuple(renderer.pending))
+    except Exception:
+        return ScenarioResult(scenario, None, traceback.format_exc())
+
+
+def _readScenario(scenario: Scenario, cache: SeriesCache = None) -> VolumeWindowRecords:
+    """Reads the records of one scenario through the pooled DSS handle."""
+    label = f"{scenario.reservoir}_{scenario.year}_{scenario.scale_factor:.2f}"
+    with traceScenario(label):
+        return readVolumeWindowRecords(
+            scenario.dss_file,
+            scenario.pathFlowIn,
+            scenario.pathFlowOut,
+            scenario.pathElev,
+            scenario.window,
+            openSession(scenario.dss_file, cache),
+        )
+
+
+def run_scenarios(
+    scenarios: Sequence[Scenario],
+    workers: int = None,
+    cache: SeriesCache = None,
+    result_cache: ResultCache = None,
+    render_plots: str = "inline",
+    compact: bool = False,
+    writer: ResultWriter = None,
+    checkpoint: Checkpoint = None,
+    prefetch: int = 2,
+    store: ResultStore = None,
+) -> ScenarioRun:
+    """
+    Runs ``criticalDurationAnalysis`` for many scenarios across a process pool.
+
+    Each worker process keeps its own open DSS handle per file (see
+    ``dss.openSession``). Results are returned in the order of ``scenarios``
+    regardless of completion order, and the successful summaries are
+    concatenated once at the end.
+
+    Args:
+        scenarios (Sequence[Scenario]): Scenarios to run.
+        workers (int, optional): Number of worker processes. Defaults to the number
+            of CPUs; 1 runs every scenario in the calling process.
+        cache (SeriesCache, optional): On-disk series cache shared by all workers.
+        result_cache (ResultCache, optional): On-disk memo of per-duration results
+            shared by all workers.
+        render_plots (str, optional): ``"inline"`` saves each plot in its worker,
+            ``"off"`` skips plotting, ``"deferred"`` saves every plot in one batch
+            after all scenarios finish, and ``"faceted"`` saves one chart with a
+            panel per scenario for each reservoir and year.
+        compact (bool, optional): Return one summary row per scenario and duration
+            (see ``getVolumeWindowSummary``) instead of the long window rows.
+        writer (ResultWriter, optional): Sink that each scenario's rows are written to
+            as soon as it finishes, in a chunk named by ``scenarioName``. The rows
+            are then not kept in memory. Chunks of scenarios that are not in
+            ``scenarios`` are deleted, and so is the chunk of each scenario
+            before it is rerun. With ``"faceted"`` plots each scenario's chart
+            data is kept next to its chunk, and the charts are redrawn from
+            every scenario, skipped ones included, whenever one is rerun.
+        checkpoint (Checkpoint, optional): Record of finished scenarios (requires a
+            ``writer``). Scenarios already finished with unchanged inputs (see
+            ``scenarioKey``) are skipped, and each one that succeeds is recorded
+            once its chunk is written, so an interrupted run can be resumed.
+            With ``"deferred"`` or ``"faceted"`` plots a scenario is recorded
+            only after its plots are saved at the end of the run.
+        prefetch (int, optional): When scenarios run in the calling process, read up
+            to this many upcoming scenarios from DSS on a background thread while
+            the current one is computed (see ``prefetch.prefetchItems``); 0 reads
+            each scenario when it starts.
+        store (ResultStore, optional): Indexed store that each scenario's rows are
+            upserted into as soon as it finishes, keyed by its reservoir, year,
+            scale factor and duration. Rows of a scenario are deleted before it
+            is rerun.
+
+    Returns:
+        ScenarioRun: Combined summary DataFrame and the per-scenario results. Failed
+        scenarios carry the formatted traceback in ``error`` instead of data. With a
+        ``writer`` the summary is empty; read it back with ``writer.read()``.
+
+    Raises:
+        ValueError: If a ``checkpoint`` is given without a ``writer``, or scenarios
+            written to a ``writer`` share a name.
+
+    Notes:
+        - Skipped scenarios have neither ``data`` nor ``error`` in their result.
+        - When scenarios run in the calling process, its pooled DSS sessions
+          are closed before returning (see ``dss.closeSessions``).
+        - When stage tracing is enabled (``instrumentation.enableTracing``) the
+          workers trace to the same JSON-lines file.
+        - On Windows the calling script must guard its entry point with
+          ``if __name__ == "__main__":`` for the process pool to start.
+    """
+    scenarios = [Scenario(*scenario) for scenario in scenarios]
+    workers = workers or os.cpu_count() or 1
+    renderer = PlotRenderer(render_plots, workers)
+    results: List[Optional[ScenarioResult]] = [None] * len(scenarios)
+    if checkpoint is not None and writer is None:
+        raise ValueError("A checkpoint needs a writer to keep finished results")
+
+    names = [scenarioName(scenario) for scenario in scenarios]
+    if writer is not None and len(set(names)) < len(names):
+        raise ValueError("Scenarios written to one writer must be distinct")
+
+    # Faceted charts are rebuilt from the chart data kept next to each chunk, so
+    # a finished scenario without it is rerun rather than left out of the chart
+    keepCharts = writer is not None and renderer.mode == "faceted"
+    charted = set(writer.chartNames()) if keepCharts else set()
+
+    keys = {}
+    pending = []
+    for i, scenario in enumerate(scenarios):
+        if checkpoint is not None:
+            keys[i] = scenarioKey(scenario, compact)
+            if checkpoint.done(names[i], keys[i]) and (
+                not keepCharts or names[i] in charted
+            ):
+                results[i] = ScenarioResult(scenario, None, None)
+                continue
+        pending.append(i)
+    if checkpoint is not None:
+        logger.info("Skipping %d finished scenarios", len(scenarios) - len(pending))
+
+    # Drop results of scenarios that are no longer part of the run, and earlier
+    # results of the ones about to run, so a failed rerun leaves nothing stale
+    if writer is not None:
+        for name in writer.prune(names):
+            logger.info("Removed results of %s, which is not in this run", name)
+        for i in pending:
+            writer.remove(names[i])
+    if checkpoint is not None:
+        checkpoint.prune(names)
+        for i in pending:
+            checkpoint.discard(names[i])
+    if store is not None:
+        for i in pending:
+            scenario = scenarios[i]
+            store.delete(scenario.reservoir, scenario.year, scenario.scale_factor)
+
+    # Deferred plots only exist once the renderer is flushed, so scenarios are
+    # recorded as finished after that; an interrupted run then redoes their plots
+    deferMarks = renderer.mode in ("deferred", "faceted")
+    finished = []
+
+    def collect(i: int, result: ScenarioResult) -> None:
+        if store is not None and result.data is not None:
+            store.upsert(result.scenario.reservoir, result.scenario.year, result.data)
+        if writer is not None and result.data is not None:
+            if keepCharts:
+                writer.appendCharts(result.plots, names[i])
+            writer.append(result.data, name=names[i])
+            result = result._replace(data=None)
+            if checkpoint is not None:
+                if deferMarks:
+                    finished.append(i)
+                else:
+                    checkpoint.mark(names[i], keys[i])
+        results[i] = result
+
+    if workers == 1 or len(pending) <= 1:
+        if prefetch and len(pending) > 1:
+            # Read upcoming scenarios on a background thread while computing
+            reads = prefetchItems(
+                pending, lambda i: _readScenario(scenarios[i], cache), prefetch
+            )
+        else:
+            reads = ((i, None, None) for i in pending)
+        try:
+            for i, records, error in reads:
+                if error is not None:
+                    collect(i, ScenarioResult(scenarios[i], None, error))
+                    continue
+                collect(
+                    i,
+                    _runScenario(
+                        scenarios[i],
+                        cache,
+                        result_cache,
+                        render_plots,
+                        compact,
+                        records=records,
+                    ),
+                )
+        finally:
+            # The pooled handles belong to this process, not to a worker that
+            # exits; release them so the DSS files are not left open (and
+            # locked on Windows) after the run
+            reads.close()
+            closeSessions()
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            futures = {
+                pool.submit(
+                    _runScenario,
+                    scenarios[i],
+                    cache,
+                    result_cache,
+                    render_plots,
+                    compact,
+                    activeTracer(),
+                ): i
+                for i in pending
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    result = future.result()
+                except Exception:
+                    # The worker itself died (e.g. BrokenProcessPool)
+                    result = ScenarioResult(scenarios[i], None, traceback.format_exc())
+                collect(i, result)
+
+    if keepCharts:
+        # Draw every scenario of the run, including the skipped ones
+        if pending:
+            renderer.pending.extend(writer.readCharts(names))
+    else:
+        for result in results:
+            renderer.pending.extend(result.plots)
+    errors = renderer.flush()
+    for path, error in errors.items():
+        logger.warning("Failed to save %s: %s", path, error)
+    for i in finished:
+        if not any(path in errors for _, path in results[i].plots):
+            checkpoint.mark(names[i], keys[i])
+
+    frames = [result.data for result in results if result.data is not None]
+    output = pd.concat(frames) if frames else pd.DataFrame()
+    return ScenarioRun(output, results)
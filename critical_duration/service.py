@@ -0,0 +1,371 @@
+import json
+import logging
+import os
+import re
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Tuple, Union
+import pandas as pd
+from .cache import ResultCache, SeriesCache
+from .dss import closeSessions
+from .results import _DATE_COLUMNS
+from .runner import Scenario, _runScenario
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8750
+
+_REQUIRED_FIELDS = [
+    "dss_file",
+    "year",
+    "ds_channel_capacity",
+    "pathFlowIn",
+    "pathFlowOut",
+    "pathElev",
+    "window",
+    "scale_factor",
+]
+_JOB_DEFAULTS = {
+    "reservoir": "",
+    "outputDirectory": "",
+    "durations": [1, 2, 3, 5, 7],
+}
+# The reservoir name becomes part of plot file names
+_RESERVOIR = re.compile(r"[^/\\:]*")
+_RENDER_MODES = ("off", "inline")
+
+_NUMBER = (int, float)
+_FIELD_TYPES = {
+    "dss_file": (str, "a string"),
+    "reservoir": (str, "a string"),
+    "year": (int, "an integer"),
+    "ds_channel_capacity": (_NUMBER, "a number"),
+    "scale_factor": (_NUMBER, "a number"),
+    "pathFlowIn": (str, "a string"),
+    "pathFlowOut": (str, "a string"),
+    "pathElev": (str, "a string"),
+    "outputDirectory": (str, "a string"),
+}
+
+
+def _checkField(name: str, value, kind, description: str) -> None:
+    # bool is an int subclass but never a valid count, year or flow
+    if isinstance(value, bool) or not isinstance(value, kind):
+        raise ValueError(f"{name} must be {description}, not {value!r}")
+
+
+def _outputDirectory(root: str, directory: str) -> str:
+    """
+    ``directory`` resolved below ``root``.
+
+    Raises:
+        ValueError: If ``directory`` is absolute or leads outside ``root``.
+    """
+    root = os.path.realpath(root)
+    target = os.path.realpath(os.path.join(root, directory))
+    if os.path.isabs(directory) or os.path.commonpath([root, target]) != root:
+        raise ValueError(
+            f"outputDirectory must be a subdirectory of the server's output "
+            f"directory, not {directory!r}"
+        )
+    return target
+
+
+def _parseJob(job: dict, outputRoot: str = "outputs") -> Tuple[Scenario, bool, str]:
+    """
+    Scenario, compact flag and plot mode of a job request.
+
+    The job's ``outputDirectory`` is resolved below ``outputRoot``.
+
+    Raises:
+        ValueError: If a required field is missing or a value is invalid.
+    """
+    if not isinstance(job, dict):
+        raise ValueError("A job must be a JSON object")
+    missing = [field for field in _REQUIRED_FIELDS if field not in job]
+    if missing:
+        raise ValueError(f"Missing job fields: {', '.join(missing)}")
+    given = {key: value for key, value in job.items() if key in Scenario._fields}
+    fields = {**_JOB_DEFAULTS, **given}
+    for name, (kind, description) in _FIELD_TYPES.items():
+        _checkField(name, fields[name], kind, description)
+    window = fields["window"]
+    if not (
+        isinstance(window, list)
+        and len(window) == 2
+        and all(isinstance(time, str) for time in window)
+    ):
+        raise ValueError(f"window must be a list of two date strings, not {window!r}")
+    durations = fields["durations"]
+    if not isinstance(durations, list) or not durations:
+        raise ValueError(f"durations must be a non-empty list, not {durations!r}")
+    for duration in durations:
+        # Durations index int64 tables and result cache entries
+        _checkField("durations", duration, int, "a list of whole days")
+    if not _RESERVOIR.fullmatch(fields["reservoir"]):
+        raise ValueError(
+            f"reservoir must not contain path separators, not {fields['reservoir']!r}"
+        )
+    fields["outputDirectory"] = _outputDirectory(outputRoot, fields["outputDirectory"])
+    fields["window"] = tuple(window)
+    scenario = Scenario(**fields)
+    render_plots = job.get("render_plots", "off")
+    if render_plots not in _RENDER_MODES:
+        raise ValueError(
+            f"render_plots must be one of {_RENDER_MODES}, not {render_plots!r}"
+        )
+    return scenario, bool(job.get("compact", True)), render_plots
+
+
+def _frameToJson(df: pd.DataFrame) -> dict:
+    """Columns and rows of ``df``, with ISO timestamps and nulls for NaN / NaT."""
+    df = df.reset_index(drop=True)
+    return json.loads(df.to_json(orient="split", index=False, date_format="iso"))
+
+
+def _frameFromJson(payload: dict) -> pd.DataFrame:
+    df = pd.DataFrame(payload["data"], columns=payload["columns"])
+    for col in _DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    return df
+
+
+class _JobHandler(BaseHTTPRequestHandler):
+    server: "AnalysisServer"
+
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _refused(self) -> bool:
+        """
+        Answers requests that do not come from a local client with 403.
+
+        A web page can send simple requests to localhost; its ``Origin`` (and,
+        after DNS rebinding, its ``Host``) names another site.
+        """
+        host = self.headers.get("Host")
+        origin = self.headers.get("Origin")
+        if host not in self.server.hosts:
+            self._reply(403, {"error": f"Requests for host {host!r} are not served"})
+            return True
+        if origin is not None and origin not in self.server.origins:
+            self._reply(403, {"error": f"Requests from {origin!r} are not served"})
+            return True
+        return False
+
+    def do_GET(self) -> None:
+        if self._refused():
+            return
+        if self.path != "/health":
+            self._reply(404, {"error": f"Unknown endpoint {self.path}"})
+            return
+        self._reply(200, self.server.health())
+
+    def do_POST(self) -> None:
+        if self._refused():
+            return
+        if self.path != "/jobs":
+            self._reply(404, {"error": f"Unknown endpoint {self.path}"})
+            return
+        # Browsers send JSON cross-origin only after a preflight, which is not served
+        if self.headers.get_content_type() != "application/json":
+            self._reply(415, {"error": "Jobs must be sent as application/json"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = json.loads(self.rfile.read(length))
+            scenario, compact, render_plots = _parseJob(job, self.server.output_directory)
+        except (ValueError, TypeError, KeyError) as exc:
+            self._reply(400, {"error": str(exc)})
+            return
+        self._reply(*self.server.run(scenario, compact, render_plots))
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(format, *args)
+
+
+class AnalysisServer(HTTPServer):
+    """
+    Resident analysis worker that answers jobs over HTTP on localhost.
+
+    The process keeps pandas and the analysis modules imported, its pooled DSS
+    handles open (see ``dss.openSession``) and its series and result caches
+    loaded between jobs, so a job costs only its reads and computation instead
+    of a new interpreter, imports and file opens. Jobs run one at a time in
+    the order they arrive, which keeps the shared DSS handles safe.
+
+    Endpoints:
+        - ``GET /health``: status, job count and uptime.
+        - ``POST /jobs``: a JSON object with the ``Scenario`` fields (``dss_file``,
+          ``year``, ``ds_channel_capacity``, ``pathFlowIn``, ``pathFlowOut``,
+          ``pathElev``, ``window``, ``scale_factor`` and optionally ``reservoir``,
+          ``outputDirectory`` and ``durations``), plus optional ``compact``
+          (default true) and ``render_plots`` (``"off"`` or ``"inline"``), sent
+          as ``application/json``. The job's ``outputDirectory`` is a
+          subdirectory of the server's ``output_directory``. The reply holds
+          the result table as ``{"columns", "data"}`` and the job time in
+          ``seconds``; a failed job is answered with status 422 and its
+          traceback in ``error``, an invalid one with 400.
+
+    Args:
+        port (int, optional): Port on 127.0.0.1; 0 picks a free one.
+        cache (SeriesCache, optional): Series cache for the DSS reads.
+        result_cache (ResultCache, optional): Memo of per-duration results.
+        output_directory (str, optional): Directory that job outputs (plots) are
+            written below.
+
+    Notes:
+        - The server only binds the loopback interface and has no
+          authentication; do not forward its port.
+        - Requests whose ``Host`` is not this server or whose ``Origin`` is
+          another site (e.g. a web page open in a browser) are refused with 403,
+          and jobs not sent as JSON with 415.
+    """
+
+    def __init__(
+        self,
+        port: int = DEFAULT_PORT,
+        cache: SeriesCache = None,
+        result_cache: ResultCache = None,
+        output_directory: str = "outputs",
+    ):
+        super().__init__(("127.0.0.1", port), _JobHandler)
+        self.cache = cache
+        self.result_cache = result_cache
+        self.output_directory = output_directory
+        self.jobs = 0
+        self.started = time.time()
+        port = self.server_address[1]
+        self.hosts = {f"127.0.0.1:{port}", f"localhost:{port}"}
+        self.origins = {f"http://{host}" for host in self.hosts}
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def health(self) -> dict:
+        """Status, number of jobs run and seconds since the server started."""
+        return {"status": "ok", "jobs": self.jobs, "uptime": time.time() - self.started}
+
+    def run(
+        self, scenario: Scenario, compact: bool, render_plots: str
+    ) -> Tuple[int, dict]:
+        """Runs one job and returns the HTTP status and reply body."""
+        start = time.perf_counter()
+        result = _runScenario(
+            scenario, self.cache, self.result_cache, render_plots, compact
+        )
+        seconds = time.perf_counter() - start
+        self.jobs += 1
+        if result.error is not None:
+            logger.warning("Job for scale factor %.2f failed", scenario.scale_factor)
+            return 422, {"error": result.error, "seconds": seconds}
+        logger.info(
+            "Job for scale factor %.2f took %.3f s", scenario.scale_factor, seconds
+        )
+        return 200, {"result": _frameToJson(result.data), "seconds": seconds}
+
+    def server_close(self) -> None:
+        super().server_close()
+        closeSessions()
+
+
+def serve(
+    port: int = DEFAULT_PORT,
+    cache_dir: str = None,
+    result_cache_dir: str = None,
+    output_directory: str = "outputs",
+) -> None:
+    """
+    Runs an ``AnalysisServer`` until interrupted.
+
+    Args:
+        port (int, optional): Port on 127.0.0.1.
+        cache_dir (str, optional): Directory of a ``SeriesCache`` for DSS reads.
+        result_cache_dir (str, optional): Directory of a ``ResultCache``.
+        output_directory (str, optional): Directory that job outputs are written below.
+    """
+    server = AnalysisServer(
+        port,
+        SeriesCache(cache_dir) if cache_dir else None,
+        ResultCache(result_cache_dir) if result_cache_dir else None,
+        output_directory,
+    )
+    logger.info("Serving analysis jobs at %s", server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class AnalysisClient:
+    """
+    Submits jobs to a running ``AnalysisServer``.
+
+    Args:
+        url (str, optional): Base URL of the server.
+        timeout (float, optional): Seconds to wait for a reply.
+    """
+
+    def __init__(
+        self, url: str = f"http://127.0.0.1:{DEFAULT_PORT}", timeout: float = 600
+    ):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path: str, body: dict = None) -> dict:
+        data = None if body is None else json.dumps(body).encode()
+        request = urllib.request.Request(
+            self.url + path, data=data, headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as exc:
+            reply = json.loads(exc.read() or b"{}")
+            raise RuntimeError(reply.get("error", str(exc))) from None
+
+    def health(self) -> dict:
+        """Returns the server status, job count and uptime."""
+        return self._request("/health")
+
+    def run(
+        self,
+        scenario: Union[Scenario, dict],
+        compact: bool = True,
+        render_plots: str = "off",
+    ) -> pd.DataFrame:
+        """
+        Runs one scenario on the server.
+
+        Args:
+            scenario (Scenario or dict): The job; a dict may omit the optional
+                ``Scenario`` fields. ``outputDirectory`` is relative to the
+                server's output directory.
+            compact (bool, optional): Return one row per duration (see
+                ``criticalDurationAnalysis``).
+            render_plots (str, optional): ``"off"`` or ``"inline"`` (the server saves
+                the plot).
+
+        Returns:
+            pd.DataFrame: The result table of ``criticalDurationAnalysis``.
+
+        Raises:
+            RuntimeError: If the job is invalid or fails; the message holds the
+                server's error or the scenario's traceback.
+        """
+        job = dict(scenario._asdict() if isinstance(scenario, Scenario) else scenario)
+        job.update(compact=compact, render_plots=render_plots)
+        return _frameFromJson(self._request("/jobs", job)["result"])
@@ -0,0 +1,249 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Tuple
+from .data_processing import _prefixSum, _summaryFrame
+from .dss import DssSession
+from .instrumentation import stage
+
+
+class StreamingVolumeWindows:
+    """
+    Computes volume windows from a flow record delivered in time chunks.
+
+    Feed consecutive chunks to ``update`` and call ``summary`` at the end. Only
+    the last longest-duration window of rows is carried between chunks, together
+    with the running prefix sums at those rows, the best window found so far per
+    duration and the prefix sum at the time of peak storage. Memory therefore
+    depends on the chunk size, not the record length, and the results are the
+    same as ``getVolumeWindowSummary`` on the whole record.
+
+    Args:
+        time_peak_stor (pd.Timestamp): Timestamp of the peak storage event.
+        durations (List[int]): List of durations (in days).
+        interval (float, optional): Record interval in seconds. Defaults to the
+            ``attrs["interval"]`` of the chunks, then to the index spacing.
+
+    Raises:
+        ValueError: From ``update`` if the record does not have a regular time step
+            that divides a day, or chunks are not consecutive.
+    """
+
+    def __init__(
+        self,
+        time_peak_stor: pd.Timestamp,
+        durations: List[int] = [1, 2, 3, 5, 7],
+        interval: float = None,
+    ):
+        self.time_peak_stor = np.datetime64(pd.Timestamp(time_peak_stor), "ns")
+        self.durations = list(durations)
+        self.interval = interval
+        self.step = None
+        self.rows = 0
+        self._times = np.array([], dtype="datetime64[ns]")
+        self._cs = np.zeros(1)
+        self._nanCount = np.zeros(1)
+        self._peakSum = 0.0
+        self._best: Dict[int, Tuple[float, int, int, float]] = {}
+
+    def _checkStep(self, times: np.ndarray) -> None:
+        if len(times) < 2:
+            return
+        steps = np.diff(times).astype(np.int64) / 1e9
+        if self.step is None:
+            self.step = float(self.interval or steps[0])
+        if not (steps == self.step).all() or 86400 % self.step:
+            raise ValueError(
+                "Streaming needs consecutive chunks with a regular time step that "
+                "divides a day"
+            )
+
+    def update(self, df: pd.DataFrame) -> None:
+        """
+        Adds the next chunk of the record.
+
+        Args:
+            df (pd.DataFrame): Chunk with a 'flow' column, starting one time step
+                after the previous chunk.
+        """
+        if not len(df):
+            return
+        if self.interval is None:
+            self.interval = df.attrs.get("interval")
+        carried = len(self._times)
+        times = np.concatenate([self._times, df.index.values.astype("datetime64[ns]")])
+        self._checkStep(times)
+
+        flow = df.flow.to_numpy(dtype=np.float64)
+        missing = np.isnan(flow)
+        # Continue the running prefix sums from the last carried value, adding in
+        # the same order as one cumulative sum over the whole record would
+        values = np.where(missing, 0.0, flow)
+        cs = np.concatenate([self._cs[:-1], np.cumsum(np.append(self._cs[-1], values))])
+        nanCount = np.concatenate(
+            [self._nanCount[:-1], self._nanCount[-1] + _prefixSum(missing)]
+        )
+        self.rows += len(df)
+
+        peakPos = np.searchsorted(times, self.time_peak_stor, side="right")
+        if peakPos > 0:
+            self._peakSum = float(cs[peakPos])
+
+        m = len(times)
+        longest = len(times)
+        if self.step is not None:
+            with stage("rolling_calc", durations=len(self.durations)) as s:
+                for n_day in self.durations:
+                    self._updateDuration(n_day, times, cs, nanCount, carried)
+                s.rows = len(df)
+            longest = int(86400 * max(self.durations) // self.step)
+
+        # Carry the rows that windows ending in later chunks can still start at
+        keep = max(m - longest, 0)
+        self._times = times[keep:]
+        self._cs = cs[keep:]
+        self._nanCount = nanCount[keep:]
+
+    def _updateDuration(
+        self,
+        n_day: int,
+        times: np.ndarray,
+        cs: np.ndarray,
+        nanCount: np.ndarray,
+        carried: int,
+    ) -> None:
+        window = int(86400 * n_day // self.step)
+        m = len(times)
+        # Windows ending at carried rows were evaluated with the previous chunk
+        first = max(window, carried)
+        if first >= m:
+            return
+        ends = np.arange(first, m)
+        means = (cs[ends] - cs[ends - window]) / window
+        means[(nanCount[ends] - nanCount[ends - window]) > 0] = np.nan
+        if np.isnan(means).all():
+            return
+        best = int(np.nanargmax(means))
+        previous = self._best.get(n_day)
+        # Strictly greater keeps the first maximum over the whole record
+        if previous is None or means[best] > previous[0]:
+            end = ends[best]
+            self._best[n_day] = (
+                float(means[best]),
+                int(times[end - window].astype(np.int64)),
+                int(times[end].astype(np.int64)),
+                float(cs[end - window]),
+            )
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Returns the volume windows of the chunks seen so far.
+
+        Returns:
+            pd.DataFrame: Same layout as ``getVolumeWindowSummary``.
+
+        Raises:
+            ValueError: If the record is shorter than one of the requested durations.
+        """
+        windows = {}
+        for n_day in self.durations:
+            if n_day not in self._best:
+                raise ValueError(f"Record is too short for a {n_day}-day window")
+            max_val, start, end, beginSum = self._best[n_day]
+            event = np.maximum(np.float64(self._peakSum) - beginSum, 0.0)
+            v_event_n_day_window = event * self.step
+            n_day_vol = np.float64(max_val) * 86400 * n_day
+            windows[n_day] = {
+                "window_start": start,
+                "window_end": end,
+                "max_flow": max_val,
+                "ratio": float(np.trunc(v_event_n_day_window / n_day_vol * 1000) / 1000),
+            }
+        return _summaryFrame(windows, self.durations)
+
+
+def streamVolumeWindowSummary(
+    chunks: Iterable[pd.DataFrame],
+    time_peak_stor: pd.Timestamp,
+    durations: List[int] = [1, 2, 3, 5, 7],
+    interval: float = None,
+) -> pd.DataFrame:
+    """
+    Computes ``getVolumeWindowSummary`` from a flow record delivered in chunks.
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): Consecutive chunks with a 'flow' column,
+            e.g. from ``DssSession.read_chunks``.
+        time_peak_stor (pd.Timestamp): Timestamp of the peak storage event.
+        durations (List[int]): List of durations (in days).
+        interval (float, optional): Record interval in seconds.
+
+    Returns:
+        pd.DataFrame: Same layout as ``getVolumeWindowSummary``.
+
+    Raises:
+        ValueError: If the record is irregular or shorter than one of the durations.
+    """
+    windows = StreamingVolumeWindows(time_peak_stor, durations, interval)
+    for chunk in chunks:
+        windows.update(chunk)
+    return windows.summary()
+
+
+def streamPeakTime(chunks: Iterable[pd.DataFrame], column: str = "elev") -> pd.Timestamp:
+    """
+    Finds the time of the first maximum of ``column`` across chunks.
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): Consecutive chunks, e.g. pool elevation.
+        column (str, optional): Column to search.
+
+    Returns:
+        pd.Timestamp: Time of the maximum, or NaT if every value is missing.
+    """
+    best, peak = -np.inf, pd.NaT
+    for chunk in chunks:
+        values = chunk[column]
+        if values.notna().any() and values.max() > best:
+            best, peak = values.max(), values.idxmax()
+    return peak
+
+
+def getStreamingVolumeWindowSummary(
+    dss_file: str,
+    pathFlowIn: str,
+    pathElev: str,
+    window: Tuple[str, str],
+    durations: List[int] = [1, 2, 3, 5, 7],
+    chunk: str = "365D",
+    session: DssSession = None,
+) -> Tuple[pd.DataFrame, pd.Timestamp]:
+    """
+    Computes volume windows for a long DSS record without loading it whole.
+
+    The pool elevation is streamed once to find the time of peak storage and the
+    inflow is then streamed through ``StreamingVolumeWindows``.
+
+    Args:
+        dss_file (str): Path to the DSS file.
+        pathFlowIn (str): DSS path for inflow data (regular interval).
+        pathElev (str): DSS path for elevation data.
+        window (Tuple[str, str]): Time window for data extraction (start, end).
+        durations (List[int]): List of durations (in days).
+        chunk (str, optional): Chunk length as a pandas timedelta string.
+        session (DssSession, optional): Open session to read from.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.Timestamp]: Summary as ``getVolumeWindowSummary`` and
+        the time of peak storage.
+    """
+    if session is None:
+        with DssSession(dss_file) as session:
+            return getStreamingVolumeWindowSummary(
+                dss_file, pathFlowIn, pathElev, window, durations, chunk, session
+            )
+
+    time_peak_stor = streamPeakTime(session.read_chunks(pathElev, "elev", window, chunk))
+    summary = streamVolumeWindowSummary(
+        session.read_chunks(pathFlowIn, "flow", window, chunk), time_peak_stor, durations
+    )
+    return summary, time_peak_stor
@@ -0,0 +1,191 @@
+import os
+from typing import Dict, List, Union
+from .cache import ResultCache, SeriesCache
+from .catalog import findScenarioPaths
+from .results import Checkpoint, ResultStore, ResultWriter
+from .runner import Scenario, ScenarioRun, run_scenarios
+
+_PATH_KEYS = ("inflow", "outflow", "elev")
+
+
+def loadStudy(path: str) -> dict:
+    """
+    Reads a study definition from a TOML or YAML file.
+
+    A study names the DSS file, reservoir, year, channel capacity, analysis
+    window, durations and output directory (``[study]``), the inflow, outflow
+    and elevation records (``[paths]``), and the collection members with their
+    scale factors (``[scale_factors]``). See ``studies/terminus_2023.toml``.
+
+    Args:
+        path (str): ``.toml``, ``.yaml`` or ``.yml`` file.
+
+    Returns:
+        dict: The parsed study.
+
+    Raises:
+        ValueError: If the file extension is not supported.
+        ImportError: If a YAML study is read without PyYAML installed.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".toml":
+        try:
+            import tomllib
+        except ModuleNotFoundError:  # Python < 3.11
+            import tomli as tomllib
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    if extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("Reading YAML studies requires PyYAML") from None
+        with open(path) as f:
+            return yaml.safe_load(f)
+    raise ValueError(f"Study files must be .toml, .yaml or .yml, not {path}")
+
+
+def _expand(values: Union[List, Dict]) -> List:
+    """Expands a list, or a ``{start, stop, step}`` table with an inclusive stop."""
+    if isinstance(values, dict):
+        return list(range(values["start"], values["stop"] + 1, values.get("step", 1)))
+    return list(values)
+
+
+def studyScenarios(study: dict) -> List[Scenario]:
+    """
+    Expands a study into one ``Scenario`` per collection member.
+
+    ``[paths]`` entries are either B-parts, matched against the DSS catalog with
+    ``findScenarioPaths``, or full pathname templates containing ``/`` with
+    ``{collection_id}``, ``{alternative}`` and ``{year}`` fields.
+
+    Args:
+        study (dict): Study as returned by ``loadStudy``.
+
+    Returns:
+        List[Scenario]: Scenarios in collection ID order.
+
+    Raises:
+        ValueError: If the collection IDs and scale factors differ in length.
+    """
+    settings = study["study"]
+    paths = study["paths"]
+    year = settings["year"]
+    alternative = paths.get("alternative", "").format(year=year) or None
+
+    collectionIds = _expand(study["scale_factors"]["collection_ids"])
+    percents = _expand(study["scale_factors"]["percent"])
+    if len(collectionIds) != len(percents):
+        raise ValueError(
+            f"{len(collectionIds)} collection IDs but {len(percents)} scale factors"
+        )
+    scaleFactors = dict(zip(collectionIds, percents))
+
+    if all("/" in paths[key] for key in _PATH_KEYS):
+        triples = [
+            [
+                paths[key].format(
+                    collection_id=collectionId, alternative=alternative, year=year
+                )
+                for key in _PATH_KEYS
+            ]
+            for collectionId in collectionIds
+        ]
+        members = zip(collectionIds, triples)
+    else:
+        members = [
+            (match.collection_id, [match.pathFlowIn, match.pathFlowOut, match.pathElev])
+            for match in findScenarioPaths(
+                settings["dss_file"],
+                *(paths[key] for key in _PATH_KEYS),
+                alternative=alternative,
+                interval=paths.get("interval"),
+            )
+            if match.collection_id in scaleFactors
+        ]
+
+    return [
+        Scenario(
+            settings["dss_file"],
+            year,
+            settings["ds_channel_capacity"],
+            *triple,
+            tuple(settings["window"]),
+            scaleFactors[collectionId] / 100,
+            settings["reservoir"],
+            settings.get("output_directory", "outputs"),
+            list(settings.get("durations", [1, 2, 3, 5, 7])),
+        )
+        for collectionId, triple in sorted(members)
+    ]
+
+
+def runStudy(
+    study: dict,
+    workers: int = None,
+    render_plots: str = "inline",
+    compact: bool = False,
+    restart: bool = False,
+    prefetch: int = 2,
+    cache: SeriesCache = None,
+    result_cache: ResultCache = None,
+) -> ScenarioRun:
+    """
+    Runs every scenario of a study, resuming a previous run by default.
+
+    Results are streamed to ``{output_directory}/{reservoir}_{year}_results``
+    with a checkpoint per scenario in its ``checkpoints`` subdirectory,
+    upserted into the ``ResultStore`` at ``[study] store`` (default
+    ``{output_directory}/critical_duration.sqlite``), and exported to
+    ``{reservoir}_{year}_critical_duration_summary.xlsx``. A rerun
+    skips the scenarios that already finished with unchanged inputs and only
+    runs failed, new or changed ones.
+
+    Args:
+        study (dict): Study as returned by ``loadStudy``.
+        workers (int, optional): Worker processes; see ``run_scenarios``.
+        render_plots (str, optional): Plot rendering mode; see ``run_scenarios``.
+        compact (bool, optional): Write one summary row per scenario and duration.
+        restart (bool, optional): Discard earlier results, stored results of this
+            reservoir and year, and checkpoints first.
+        prefetch (int, optional): Read-ahead depth; see ``run_scenarios``.
+        cache (SeriesCache, optional): Series cache for the DSS reads, so a rerun
+            reads its records from the cache instead of the DSS file.
+        result_cache (ResultCache, optional): Memo of per-duration results, so a
+            rerun that adds a duration only computes the new one.
+
+    Returns:
+        ScenarioRun: As ``run_scenarios``.
+    """
+    settings = study["study"]
+    outputDirectory = settings.get("output_directory", "outputs")
+    name = f"{settings['reservoir']}_{settings['year']}"
+    resultDirectory = os.path.join(outputDirectory, f"{name}_results")
+
+    writer = ResultWriter(resultDirectory, overwrite=restart)
+    checkpoint = Checkpoint(os.path.join(resultDirectory, "checkpoints"))
+    store = ResultStore(
+        settings.get("store", os.path.join(outputDirectory, "critical_duration.sqlite"))
+    )
+    if restart:
+        checkpoint.clear()
+        store.delete(settings["reservoir"], settings["year"])
+
+    with store:
+        run = run_scenarios(
+            studyScenarios(study),
+            workers=workers,
+            cache=cache,
+            result_cache=result_cache,
+            render_plots=render_plots,
+            compact=compact,
+            writer=writer,
+            checkpoint=checkpoint,
+            prefetch=prefetch,
+            store=store,
+        )
+    writer.to_excel(
+        os.path.join(outputDirectory, f"{name}_critical_duration_summary.xlsx")
+    )
+    return run
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+from typing import List
+
+
+def syntheticHydrograph(
+    periods: int,
+    freq: str = "h",
+    start: str = "2021-12-01 01:00",
+    n_events: int = None,
+    peak_flow: float = 8000.0,
+    base_flow: float = 200.0,
+    ds_channel_capacity: float = 5500.0,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Generates a reservoir inflow, outflow and pool elevation record without DSS.
+
+    Inflow is a base flow plus gamma-shaped flood waves at random times. The
+    reservoir is routed as a level pool that releases up to the downstream
+    channel capacity and stores the rest, so outflow, pool elevation and peak
+    storage behave like the regulated records the analysis reads from DSS.
+
+    Args:
+        periods (int): Number of time steps.
+        freq (str, optional): Time step as a pandas frequency (e.g. 'h', '15min').
+        start (str, optional): Timestamp of the first value.
+        n_events (int, optional): Number of flood waves. Defaults to one per 90 days,
+            at least one.
+        peak_flow (float, optional): Typical flood wave peak (cfs).
+        base_flow (float, optional): Base inflow (cfs).
+        ds_channel_capacity (float, optional): Maximum release (cfs).
+        seed (int, optional): Seed for the random event times and sizes.
+
+    Returns:
+        pd.DataFrame: Indexed by 'date' with columns 'inflow', 'outflow' (cfs) and
+        'elev' (ft).
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=periods, freq=freq, name="date")
+    dt = pd.Timedelta(index.freq).total_seconds() if periods > 1 else 3600.0
+    hours = np.arange(periods) * dt / 3600
+
+    if n_events is None:
+        n_events = max(1, int(hours[-1] // (90 * 24)))
+    inflow = np.full(periods, base_flow)
+    for _ in range(n_events):
+        t0 = rng.uniform(0, hours[-1])
+        rise = rng.uniform(12, 72)
+        peak = peak_flow * rng.uniform(0.3, 1.2)
+        # Gamma-shaped wave peaking one rise time after t0; negligible after 15 rises
+        lo, hi = np.searchsorted(hours, [t0, t0 + 15 * rise])
+        t = (hours[lo:hi] - t0) / rise
+        inflow[lo:hi] += peak * (t * np.exp(1 - t)) ** 3
+
+    outflow = np.empty(periods)
+    storage = np.empty(periods)
+    s = 0.0
+    for i, q in enumerate(inflow):
+        # Pass inflow and evacuate storage, up to the channel capacity
+        release = min(q + s / dt, ds_channel_capacity)
+        s = max(s + (q - release) * dt, 0.0)
+        outflow[i] = release
+        storage[i] = s
+    elev = 500.0 + 0.002 * np.sqrt(storage)
+
+    return pd.DataFrame(
+        {"inflow": inflow, "outflow": outflow, "elev": elev}, index=index
+    )
+
+
+def syntheticScenarios(
+    periods: int,
+    scale_factors: List[float],
+    freq: str = "h",
+    seed: int = 0,
+    **kwargs,
+) -> List[pd.DataFrame]:
+    """
+    Generates one synthetic record per scale factor from a common hydrograph.
+
+    The base inflow is scaled like the collection members of a scale-factor
+    study and re-routed, so every scenario shares the same time index.
+
+    Args:
+        periods (int): Number of time steps.
+        scale_factors (List[float]): Inflow scale factor of each scenario.
+        freq (str, optional): Time step as a pandas frequency.
+        seed (int, optional): Seed for the base hydrograph.
+        **kwargs: Passed to ``syntheticHydrograph``.
+
+    Returns:
+        List[pd.DataFrame]: One record per scale factor, as ``syntheticHydrograph``.
+    """
+    peak_flow = kwargs.pop("peak_flow", 8000.0)
+    return [
+        syntheticHydrograph(
+            periods, freq=freq, seed=seed, peak_flow=peak_flow * sf, **kwargs
+        )
+        for sf in scale_factors
+    ]
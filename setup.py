@@ -13,11 +13,15 @@ setup(
         'pydsstools',
         'altair',
         'openpyxl',
-        "pytest"
+        "pytest",
+        'tomli; python_version < "3.11"',
     ],
+    extras_require={
+        'yaml': ['pyyaml'],
+    },
     entry_points={
         'console_scripts': [
-            'run_analysis=scripts.run_analysis:main',
+            'critical-duration=critical_duration.cli:main',
         ],
     },
 )
\ No newline at end of file
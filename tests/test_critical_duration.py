@@ -2,8 +2,85 @@ from critical_duration.data_processing import (
     getVolumeWindowData,
     readDssData,
     getCriticalDurationPlotData,
+    volumeWindowCalculations,
+    batchVolumeWindowCalculations,
+    getVolumeWindowSummary,
+    getCriticalDurationCurve,
+    channelExceedanceTimes,
+    compactPlotData,
+    volumeWindowChartData,
+    volumeWindowPlotData,
 )
+from critical_duration.cache import ResultCache, SeriesCache
+from critical_duration.catalog import parseFPart
+from critical_duration.dss import (
+    DssSession,
+    _recordFrame,
+    closeSessions,
+    intervalSeconds,
+    openSession,
+)
+from critical_duration.events import detectEvents, eventVolumeWindows
+from critical_duration.instrumentation import disableTracing, enableTracing, traceScenario
+from critical_duration.plotting import PlotRenderer, plot_volume_window, plot_volume_windows
+from critical_duration.prefetch import prefetchItems
+from critical_duration.results import Checkpoint, ResultStore, ResultWriter
+from critical_duration.runner import Scenario, run_scenarios, scenarioKey, scenarioName
+from critical_duration.service import (
+    AnalysisClient,
+    AnalysisServer,
+    _frameFromJson,
+    _frameToJson,
+)
+from critical_duration.study import loadStudy, studyScenarios
+from critical_duration.streaming import streamPeakTime, streamVolumeWindowSummary
+from critical_duration.synthetic import syntheticHydrograph, syntheticScenarios
+import gc
+import json
+import os
+import subprocess
+import sys
+import weakref
+import threading
+import time
+import urllib.error
+import urllib.request
+import numpy as np
 import pandas as pd
+import pytest
+
+
+def cachedScenarios(tmp_path, scale_factors, durations=(1, 2, 3)):
+    """
+    Scenarios over synthetic records that are served from a ``SeriesCache``, so
+    they run end to end without opening the (placeholder) DSS file.
+    """
+    dss_file = tmp_path / "record.dss"
+    dss_file.write_bytes(b"dss")
+    cache = SeriesCache(str(tmp_path / "cache"))
+    window = ("01Dec2021 01:00", "10Dec2021 02:00")
+    records = syntheticScenarios(24 * 10, scale_factors, peak_flow=20000)
+    scenarios = []
+    for scale_factor, record in zip(scale_factors, records):
+        paths = [f"//TRM {part} {scale_factor}/FLOW//1HOUR//" for part in ("IN", "OUT", "ELEV")]
+        columns = {"inflow": "flow", "outflow": "flow", "elev": "elev"}
+        for path, (column, variable) in zip(paths, columns.items()):
+            series = record[[column]].rename(columns={column: variable})
+            cache.put(str(dss_file), path, window, series)
+        scenarios.append(
+            Scenario(
+                str(dss_file),
+                2023,
+                5500,
+                *paths,
+                window,
+                scale_factor,
+                "TERMINUS",
+                str(tmp_path / "out"),
+                list(durations),
+            )
+        )
+    return scenarios, cache
 
 
 class TestClass:
@@ -158,3 +235,746 @@ class TestClass:
             f"007-day volume should be 0.906, but is {volume_window_results['007-day']}"
         )
         print("here")
+
+    def test_batch_matches_per_scenario(self):
+        # Synthetic two-wave hydrographs scaled like the collection IDs
+        index = pd.date_range("2021-12-01 01:00", periods=24 * 12, freq="h", name="date")
+        hours = np.arange(len(index))
+        base = 4000 * np.exp(-(((hours - 60) / 18) ** 2)) + 2500 * np.exp(
+            -(((hours - 150) / 30) ** 2)
+        )
+        scale_factors = [0.5, 1.0, 1.5]
+        flowIn = np.vstack([100 + sf * base for sf in scale_factors])
+        elev = np.vstack([np.cumsum(f - 1500) for f in flowIn])
+        durations = [1, 2, 3, 5, 7]
+
+        batch = batchVolumeWindowCalculations(flowIn, elev, index, durations)
+
+        for i, flow in enumerate(flowIn):
+            time_peak_stor = pd.Series(elev[i], index=index).idxmax()
+            df = pd.DataFrame({"flow": flow}, index=index)
+            df, max_vols = volumeWindowCalculations(df, time_peak_stor, durations)
+
+            assert batch.time_peak_stor[i] == time_peak_stor
+            for j, n_day in enumerate(durations):
+                met = f"{n_day}".zfill(3) + "-day"
+                window = df[met].dropna()
+                assert batch.ratios[i, j] == max_vols[met]
+                assert batch.window_start[i, j] == window.index.min()
+                assert batch.window_end[i, j] == window.index.max()
+
+    def test_parse_f_part(self):
+        fpart = "C:000010|EXISTING C:2023_SDI D:RESSIM-FRA SHIFT"
+
+        assert parseFPart(fpart) == (10, "EXISTING C:2023_SDI D:RESSIM-FRA SHIFT")
+        assert parseFPart("EXISTING C:2023_SDI D:RESSIM-FRA SHIFT") is None
+
+    def test_run_scenarios_captures_failures(self):
+        scenario = Scenario(
+            "data/Missing_Data.dss",
+            2023,
+            5500,
+            "//TRM-TRM INFLOW-KAWEAH/FLOW//1HOUR/C:000010|EXISTING C:2023_SDI D:RESSIM-FRA SHIFT/",
+            "//TRM-TRM OUTFLOW-KAWEAH/FLOW//1HOUR/C:000010|EXISTING C:2023_SDI D:RESSIM-FRA SHIFT/",
+            "//TERMINUS DAM-POOL/ELEV//1HOUR/C:000010|EXISTING C:2023_SDI D:RESSIM-FRA SHIFT/",
+            ("01Dec2021 01:00", "10Dec2021 02:00"),
+            0.5,
+            "TERMINUS",
+            "outputs",
+            [1, 2, 3, 5, 7],
+        )
+
+        run = run_scenarios([scenario, scenario._replace(scale_factor=1.0)], workers=1)
+
+        assert run.output.empty
+        assert [r.scenario.scale_factor for r in run.results] == [0.5, 1.0]
+        assert len(run.failures) == 2
+        assert "Cannot locate DSS file" in run.failures[0].error
+
+    def test_run_scenarios_closes_in_process_sessions(self, tmp_path):
+        dss_file = tmp_path / "record.dss"
+        dss_file.write_bytes(b"dss")
+        scenario = Scenario(
+            str(dss_file),
+            2023,
+            5500,
+            "//A/FLOW-IN//1HOUR//",
+            "//A/FLOW-OUT//1HOUR//",
+            "//A/ELEV//1HOUR//",
+            ("01Dec2021 01:00", "10Dec2021 02:00"),
+            0.5,
+            "TERMINUS",
+            str(tmp_path),
+            [1],
+        )
+        session = openSession(str(dss_file))
+
+        # Both the prefetch thread and the plain loop leave no file open
+        for prefetch in [2, 0]:
+            run = run_scenarios(
+                [scenario, scenario._replace(scale_factor=1.0)],
+                workers=1,
+                prefetch=prefetch,
+            )
+            assert len(run.failures) == 2
+            assert session.closed
+            session = openSession(str(dss_file))
+        closeSessions()
+
+    def test_series_cache(self, tmp_path):
+        dss_file = tmp_path / "record.dss"
+        dss_file.write_bytes(b"dss")
+        path = "//TRM-TRM INFLOW-KAWEAH/FLOW//1HOUR/C:000010|EXISTING C:2023_SDI D:RESSIM-FRA SHIFT/"
+        window = ("01Dec2021 01:00", "10Dec2021 02:00")
+        idx = pd.date_range("2021-12-01 01:00", periods=218, freq="h", name="date")
+        df = pd.DataFrame({"flow": np.arange(218, dtype=np.float32)}, index=idx)
+        cache = SeriesCache(str(tmp_path / "cache"))
+
+        assert cache.get(str(dss_file), path, "flow", window) is None
+        cache.put(str(dss_file), path, window, df)
+        cached = cache.get(str(dss_file), path, "flow", window)
+        pd.testing.assert_frame_equal(cached, df, check_freq=False)
+        # Entries are written through temporary files that are renamed into place
+        assert not [name for name in os.listdir(tmp_path / "cache") if name.endswith(".tmp")]
+
+        # Editing the DSS file invalidates its entries
+        dss_file.write_bytes(b"dss v2")
+        assert cache.get(str(dss_file), path, "flow", window) is None
+
+        # Entries beyond the size bound are evicted
+        cache.max_bytes = 0
+        cache.put(str(dss_file), path, window, df)
+        assert cache.get(str(dss_file), path, "flow", window) is None
+
+    def test_result_cache_computes_only_missing_durations(self, tmp_path):
+        index = pd.date_range("2021-12-01 01:00", periods=24 * 12, freq="h", name="date")
+        hours = np.arange(len(index))
+        flow = 100 + 4000 * np.exp(-(((hours - 60) / 18) ** 2))
+        time_peak_stor = index[90]
+        cache = ResultCache(str(tmp_path / "results"))
+
+        df = pd.DataFrame({"flow": flow}, index=index)
+        expected, expected_vols = volumeWindowCalculations(
+            df.copy(), time_peak_stor, [1, 2, 3]
+        )
+        volumeWindowCalculations(df.copy(), time_peak_stor, [1, 2], cache)
+        key = cache.key(flow, index.values, time_peak_stor)
+        assert sorted(cache.get(key)) == [1, 2]
+
+        result, max_vols = volumeWindowCalculations(
+            df.copy(), time_peak_stor, [1, 2, 3], cache
+        )
+        assert sorted(cache.get(key)) == [1, 2, 3]
+        assert max_vols == expected_vols
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_plot_renderer_modes(self, tmp_path):
+        saved = []
+
+        class FakeChart:
+            def save(self, path):
+                saved.append(path)
+
+        PlotRenderer("off").submit(FakeChart(), "off.png")
+        PlotRenderer("inline").submit(FakeChart(), "inline.png")
+        assert saved == ["inline.png"]
+
+        renderer = PlotRenderer("deferred", workers=2)
+        renderer.submit(FakeChart(), "a.png")
+        renderer.submit(FakeChart(), "b.png")
+        assert saved == ["inline.png"]
+        assert renderer.flush() == {}
+        assert sorted(saved) == ["a.png", "b.png", "inline.png"]
+        assert renderer.pending == []
+
+    def test_volume_window_summary_matches_plot_data(self):
+        index = pd.date_range("2021-12-01 01:00", periods=24 * 12, freq="h", name="date")
+        hours = np.arange(len(index))
+        flow = 100 + 4000 * np.exp(-(((hours - 60) / 18) ** 2))
+        df = pd.DataFrame({"flow": flow}, index=index)
+        durations = [1, 2, 3, 5, 7]
+
+        summary = getVolumeWindowSummary(df, index[90], durations)
+        plotData = getCriticalDurationPlotData(df, index[90], durations)
+        windows = plotData.loc[plotData.metric != "flow"].groupby("metric")
+
+        assert list(summary.index) == durations
+        assert list(summary.ratio) == list(windows.text.first())
+        assert list(summary.window_start) == list(windows.date.min())
+        assert list(summary.window_end) == list(windows.date.max())
+        assert (plotData.metric == "flow").sum() == len(df)
+
+    def test_result_writer_streams_chunks(self, tmp_path):
+        writer = ResultWriter(str(tmp_path / "results"))
+        first = pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2021-12-01 08:00", "2021-12-01 09:00"]),
+                "metric": ["001-day", "001-day"],
+                "flow": [1.5, 1.5],
+                "scale_factor": [0.5, 0.5],
+            }
+        )
+        writer.append(first, name="000001")
+        writer.append(first.assign(scale_factor=0.1), name="000000")
+
+        # A new writer on the same directory picks up the chunks of a previous run
+        output = ResultWriter(str(tmp_path / "results")).read()
+
+        assert list(output.scale_factor) == [0.1, 0.1, 0.5, 0.5]
+        assert output.date.dtype == first.date.dtype
+        assert ResultWriter(str(tmp_path / "results"), overwrite=True).read().empty
+
+    def test_synthetic_hydrograph(self):
+        record = syntheticHydrograph(
+            24 * 30, n_events=1, peak_flow=20000, ds_channel_capacity=5500
+        )
+
+        assert list(record.columns) == ["inflow", "outflow", "elev"]
+        assert record.index.name == "date"
+        assert len(record) == 24 * 30
+        assert record.outflow.max() <= 5500
+        assert record.elev.idxmax() >= record.inflow.idxmax()
+
+    def test_stage_tracing(self, tmp_path):
+        record = syntheticHydrograph(24 * 30, n_events=1, peak_flow=20000)
+        df = record[["inflow"]].rename(columns={"inflow": "flow"})
+        trace = tmp_path / "trace.jsonl"
+
+        getVolumeWindowSummary(df, record.elev.idxmax(), [1, 2])
+        assert not trace.exists()
+
+        enableTracing(str(trace), log=False)
+        try:
+            with traceScenario("SYNTHETIC_2023_1.00"):
+                getVolumeWindowSummary(df, record.elev.idxmax(), [1, 2])
+        finally:
+            disableTracing()
+
+        (entry,) = [json.loads(line) for line in trace.read_text().splitlines()]
+        assert entry["stage"] == "rolling_calc"
+        assert entry["scenario"] == "SYNTHETIC_2023_1.00"
+        assert entry["rows"] == len(df)
+        assert entry["seconds"] >= 0
+
+    def test_sub_hourly_windows(self):
+        hourly = syntheticHydrograph(24 * 60, seed=1, peak_flow=20000)
+        quarter = syntheticHydrograph(4 * 24 * 60, freq="15min", seed=1, peak_flow=20000)
+        summaries = [
+            getVolumeWindowSummary(
+                record[["inflow"]].rename(columns={"inflow": "flow"}),
+                record.elev.idxmax(),
+                [1, 3, 5],
+            )
+            for record in [hourly, quarter]
+        ]
+
+        for summary in summaries:
+            span = summary.window_end - summary.window_start
+            assert (span == pd.to_timedelta(summary.index, unit="D")).all()
+        np.testing.assert_allclose(
+            summaries[1].max_flow, summaries[0].max_flow, rtol=1e-3
+        )
+        np.testing.assert_allclose(summaries[1].ratio, summaries[0].ratio, atol=0.02)
+
+        assert intervalSeconds("15MIN") == 900
+        assert intervalSeconds("1DAY") == 86400
+        assert intervalSeconds("IR-DAY") is None
+
+    def test_critical_duration_curve(self):
+        record = syntheticHydrograph(24 * 120, seed=3, peak_flow=20000)
+        df = record[["inflow"]].rename(columns={"inflow": "flow"})
+        time_peak_stor = record.elev.idxmax()
+
+        curve, critical = getCriticalDurationCurve(df, time_peak_stor, max_days=10)
+        summary = getVolumeWindowSummary(df, time_peak_stor, list(range(1, 11)))
+
+        assert len(curve) == 24 * 10
+        daily = curve.loc[pd.to_timedelta(summary.index, unit="D")]
+        daily.index = summary.index
+        pd.testing.assert_frame_equal(daily, summary)
+        assert critical == (curve.ratio - 1).abs().idxmin()
+
+    def test_streaming_matches_whole_record(self):
+        record = syntheticHydrograph(24 * 365 * 2, seed=2, peak_flow=20000)
+        df = record[["inflow"]].rename(columns={"inflow": "flow"})
+        df.iloc[500:520, 0] = np.nan
+        size = 24 * 30 + 5
+
+        time_peak_stor = streamPeakTime(
+            record[["elev"]].iloc[i : i + size] for i in range(0, len(record), size)
+        )
+        streamed = streamVolumeWindowSummary(
+            (df.iloc[i : i + size] for i in range(0, len(df), size)),
+            time_peak_stor,
+            [1, 2, 3, 5, 7, 30],
+        )
+
+        assert time_peak_stor == record.elev.idxmax()
+        pd.testing.assert_frame_equal(
+            streamed,
+            getVolumeWindowSummary(df, time_peak_stor, [1, 2, 3, 5, 7, 30]),
+        )
+
+    def test_multi_event_windows(self):
+        record = syntheticHydrograph(24 * 365 * 3, seed=4, n_events=8, peak_flow=20000)
+        df = record.rename(columns={"inflow": "flow"})
+
+        events = detectEvents(df.elev, method="threshold", threshold=520, separation="7D")
+        windows = eventVolumeWindows(df, events, 5500, [1, 3])
+
+        assert len(events) > 1
+        assert (events.time_peak_stor.diff().dropna() >= pd.Timedelta("7D")).all()
+        for event, peak in events.time_peak_stor.items():
+            part = df.loc[peak - pd.Timedelta("10D") : peak + pd.Timedelta("5D")]
+            expected = getVolumeWindowSummary(part, peak, [1, 3])
+            pd.testing.assert_frame_equal(
+                windows.loc[event, expected.columns], expected, check_index_type=False
+            )
+            assert df.elev[peak] == df.elev[events.start[event] : events.end[event]].max()
+
+    def test_compute_import_skips_plotting_and_dss_backends(self):
+        code = (
+            "import sys, critical_duration\n"
+            "from critical_duration import getVolumeWindowSummary, criticalDurationAnalysis\n"
+            "from critical_duration.runner import run_scenarios\n"
+            "print(sorted(m for m in ('altair', 'pydsstools') if m in sys.modules))"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        assert out.stdout.strip() == "[]"
+
+    def test_study_checkpoints_skip_finished_scenarios(self, tmp_path):
+        study_file = tmp_path / "study.toml"
+        study_file.write_text(
+            """
+[study]
+dss_file = "data/Missing_Data.dss"
+reservoir = "TERMINUS"
+year = 2023
+ds_channel_capacity = 5500
+window = ["01Dec2021 01:00", "10Dec2021 02:00"]
+
+[paths]
+inflow = "//TRM-TRM INFLOW-KAWEAH/FLOW//1HOUR/C:{collection_id:06d}|{alternative}/"
+outflow = "//TRM-TRM OUTFLOW-KAWEAH/FLOW//1HOUR/C:{collection_id:06d}|{alternative}/"
+elev = "//TERMINUS DAM-POOL/ELEV//1HOUR/C:{collection_id:06d}|{alternative}/"
+alternative = "EXISTING C:{year}_SDI D:RESSIM-FRA SHIFT"
+
+[scale_factors]
+collection_ids = { start = 2, stop = 4 }
+percent = [10, 15, 20]
+"""
+        )
+        scenarios = studyScenarios(loadStudy(str(study_file)))
+        assert [s.scale_factor for s in scenarios] == [0.1, 0.15, 0.2]
+        assert scenarios[0].pathFlowIn == (
+            "//TRM-TRM INFLOW-KAWEAH/FLOW//1HOUR/C:000002|EXISTING C:2023_SDI D:RESSIM-FRA SHIFT/"
+        )
+
+        names = [scenarioName(scenario) for scenario in scenarios]
+        assert len(set(names)) == 3
+        # Names, and so result chunks, sort by scale factor
+        factors = [10.0, 2.0, 0.5, 1.25]
+        named = {scenarioName(scenarios[0]._replace(scale_factor=f)): f for f in factors}
+        assert [named[name] for name in sorted(named)] == sorted(factors)
+
+        writer = ResultWriter(str(tmp_path / "results"))
+        checkpoint = Checkpoint(str(tmp_path / "results" / "checkpoints"))
+        run = run_scenarios(scenarios, workers=1, writer=writer, checkpoint=checkpoint)
+        assert len(run.failures) == 3
+        assert checkpoint.key(names[0]) is None
+
+        # Finished scenarios are skipped while their inputs are unchanged
+        finished = pd.DataFrame({"duration": [1], "ratio": [0.9], "scale_factor": [0.1]})
+        writer.append(finished, name=names[0])
+        checkpoint.mark(names[0], scenarioKey(scenarios[0]))
+        run = run_scenarios(scenarios, workers=1, writer=writer, checkpoint=checkpoint)
+        assert [r.error is None for r in run.results] == [True, False, False]
+        assert list(writer.read().ratio) == [0.9]
+
+        # A scenario whose inputs changed loses its old results before it reruns,
+        # so a failed rerun exports nothing stale
+        checkpoint.mark(names[0], "inputs before the DSS file was edited")
+        run = run_scenarios(scenarios, workers=1, writer=writer, checkpoint=checkpoint)
+        assert len(run.failures) == 3
+        assert writer.read().empty
+        assert checkpoint.key(names[0]) is None
+
+        # Results of scenarios dropped from the study are pruned; the names of the
+        # remaining scenarios do not depend on their positions
+        writer.append(finished, name=names[0])
+        checkpoint.mark(names[0], scenarioKey(scenarios[0]))
+        run = run_scenarios(scenarios[1:], workers=1, writer=writer, checkpoint=checkpoint)
+        assert writer.names() == []
+        assert checkpoint.key(names[0]) is None
+
+    def test_deferred_plots_are_saved_before_checkpoints(self, tmp_path):
+        scenarios, cache = cachedScenarios(tmp_path, [0.5, 1.0])
+        names = [scenarioName(scenario) for scenario in scenarios]
+        writer = ResultWriter(str(tmp_path / "results"))
+        checkpoint = Checkpoint(str(tmp_path / "results" / "checkpoints"))
+        # Directories in the way of the charts make every save fail
+        plotDirectory = rf"{scenarios[0].outputDirectory}\VolumeWindowPlots"
+        for chart in ["0.50_volume_window", "1.00_volume_window", "volume_windows"]:
+            os.makedirs(rf"{plotDirectory}\TERMINUS_2023_{chart}.png")
+
+        for mode in ["deferred", "faceted"]:
+            run = run_scenarios(
+                scenarios,
+                workers=1,
+                cache=cache,
+                render_plots=mode,
+                compact=True,
+                writer=writer,
+                checkpoint=checkpoint,
+            )
+            # The results are kept, but the scenarios rerun to redo their plots
+            assert run.failures == []
+            assert writer.names() == names
+            assert [checkpoint.key(name) for name in names] == [None, None]
+
+        run = run_scenarios(
+            scenarios,
+            workers=1,
+            cache=cache,
+            render_plots="off",
+            compact=True,
+            writer=writer,
+            checkpoint=checkpoint,
+        )
+        assert all(checkpoint.key(name) is not None for name in names)
+        assert len(writer.read()) == 2 * 3
+
+    def test_faceted_plots_keep_skipped_scenarios(self, tmp_path, monkeypatch):
+        saved = []
+        monkeypatch.setattr(
+            "critical_duration.plotting._save",
+            lambda chart, path: saved.append(sorted(chart.data.scenario.unique())),
+        )
+        scenarios, cache = cachedScenarios(tmp_path, [0.5, 1.0, 2.0])
+        names = [scenarioName(scenario) for scenario in scenarios]
+        writer = ResultWriter(str(tmp_path / "results"))
+        checkpoint = Checkpoint(str(tmp_path / "results" / "checkpoints"))
+        panels = ["0.50", "1.00", "2.00"]
+
+        def run():
+            saved.clear()
+            return run_scenarios(
+                scenarios,
+                workers=1,
+                cache=cache,
+                render_plots="faceted",
+                compact=True,
+                writer=writer,
+                checkpoint=checkpoint,
+            )
+
+        run()
+        assert saved == [panels]
+        assert writer.chartNames() == names
+
+        # Rerunning one scenario redraws the chart with every panel
+        checkpoint.mark(names[1], "inputs before the DSS file was edited")
+        result = run()
+        assert [len(r.plots) for r in result.results] == [0, 1, 0]
+        assert saved == [panels]
+        run()
+        assert saved == []
+
+        # A finished scenario without kept chart data is rerun to draw its panel
+        writer.remove(names[0])
+        writer.append(pd.DataFrame({"duration": [1]}), name=names[0])
+        run()
+        assert saved == [panels]
+        assert writer.chartNames() == names
+
+    def test_record_frame_wraps_values_and_shares_index(self):
+        class Container:
+            # Minimal stand-in for a DSS time series container: hourly values
+            # from 01Dec2021 01:00 in minutes since HEC julian day 44530
+            def __init__(self, values):
+                self.values = values
+                self.times = 60 + 60 * np.arange(len(values))
+                self.granularity = 60
+                self.julianBaseDate = 44530
+                self.startDateTime = "01Dec2021 01:00:00"
+
+        indexes = {}
+        flow = np.random.default_rng(0).random(48)
+        key = (("01Dec2021 01:00", "02Dec2021 24:00"), "1HOUR")
+        df = _recordFrame(Container(flow), "flow", 3600.0, indexes, key)
+        elev = _recordFrame(Container(flow * 2), "elev", 3600.0, indexes, key)
+
+        assert df.index[0] == pd.Timestamp("2021-12-01 01:00")
+        assert df.index[-1] == pd.Timestamp("2021-12-03 00:00")
+        assert np.shares_memory(df.flow.to_numpy(), flow)
+        assert elev.index is df.index
+
+    def test_record_frame_keeps_temporary_values_alive(self):
+        class Container:
+            # Hands out a new array on every access, as extension containers
+            # that build their values view on the fly do
+            times = 60 + 60 * np.arange(24)
+            granularity = 60
+            julianBaseDate = 44530
+            startDateTime = "01Dec2021 01:00:00"
+
+            def __init__(self):
+                self.handed = []
+
+            @property
+            def values(self):
+                values = np.arange(24, dtype=float)
+                self.handed.append(weakref.ref(values))
+                return values
+
+        container = Container()
+        df = _recordFrame(container, "flow", 3600.0, {})
+        gc.collect()
+
+        # The last array handed out is the one the frame wraps
+        assert container.handed[-1]() is not None
+        assert np.array_equal(df.flow.to_numpy(), np.arange(24, dtype=float))
+
+    def test_channel_capacity_sweep(self):
+        records = syntheticScenarios(24 * 60, [0.5, 1.0, 2.0], peak_flow=20000)
+        index = records[0].index
+        flowOut = np.vstack([record.outflow.to_numpy() for record in records])
+        capacities = [1000, 2500, 4000, 5499, 7000]
+
+        exceed = channelExceedanceTimes(flowOut, index, capacities)
+
+        expected = np.vstack(
+            [
+                pd.DatetimeIndex(
+                    [record.index[record.outflow > capacity].min() for capacity in capacities]
+                ).values
+                for record in records
+            ]
+        )
+        np.testing.assert_array_equal(exceed, expected)
+
+        batch = batchVolumeWindowCalculations(
+            np.vstack([record.inflow for record in records]),
+            np.vstack([record.elev for record in records]),
+            index,
+            [1, 2],
+            flowOut=flowOut,
+            capacities=capacities,
+        )
+        np.testing.assert_array_equal(batch.time_ds_channel_exceed, exceed)
+
+    def test_compact_chart_data(self):
+        record = syntheticHydrograph(24 * 365)
+        df = pd.DataFrame({"flow": record.inflow}, index=record.index)
+        summary = getVolumeWindowSummary(df, record.elev.idxmax(), [1, 3, 7])
+
+        chartData = volumeWindowChartData(df, summary, buckets=200)
+        flowRows = chartData.loc[chartData.metric == "flow"]
+        assert len(flowRows) <= 400
+        assert flowRows.flow.max() == df.flow.max()
+        assert flowRows.flow.min() == df.flow.min()
+        assert len(chartData) - len(flowRows) == 2 * len(summary)
+        labels = chartData.dropna(subset=["text"])
+        assert list(labels.date) == list(summary.window_end)
+        assert list(labels.text) == list(summary.ratio)
+
+        # The long plot data compacts to the same chart data, and compacting is idempotent
+        longData = volumeWindowPlotData(df, summary)
+        pd.testing.assert_frame_equal(compactPlotData(longData, 200), chartData)
+        pd.testing.assert_frame_equal(compactPlotData(chartData, 200), chartData)
+
+        # Every layer shares the one compact dataset
+        spec = plot_volume_window(longData, ["2021-12-01", "2022-12-05"]).to_dict()
+        assert [len(rows) for rows in spec["datasets"].values()] == [
+            len(compactPlotData(longData))
+        ]
+
+        scenarios = pd.concat(
+            [chartData.assign(scenario=f"{sf:.2f}") for sf in np.linspace(0.5, 2.0, 40)]
+        )
+        spec = plot_volume_windows(scenarios).to_dict()
+        assert len(spec["datasets"]) == 1
+        assert sum(len(rows) for rows in spec["datasets"].values()) <= 40 * (250 + 6)
+
+    def test_prefetch_reads_ahead_in_order(self):
+        started = []
+
+        def load(i):
+            started.append(i)
+            if i == 3:
+                raise OSError("unreadable record")
+            return i * 10
+
+        depth = 2
+        results = []
+        for item, value, error in prefetchItems(range(8), load, depth):
+            time.sleep(0.02)
+            # The consumed item, the queue and the item being loaded at most
+            assert len(started) <= item + 1 + depth + 1
+            results.append((item, value, error))
+
+        assert [item for item, _, _ in results] == list(range(8))
+        assert [value for _, value, _ in results] == [0, 10, 20, None, 40, 50, 60, 70]
+        assert "unreadable record" in results[3][2]
+
+        # Closing the iterator early stops the background thread
+        started.clear()
+        reads = prefetchItems(range(100), load, depth)
+        next(reads)
+        reads.close()
+        assert len(started) <= depth + 2
+
+    def test_result_store_upserts_and_queries(self, tmp_path):
+        records = syntheticScenarios(24 * 30, [0.5, 1.0, 1.5])
+        durations = [1, 3]
+        compact, long = [], []
+        for record, scale_factor in zip(records, [0.5, 1.0, 1.5]):
+            df = pd.DataFrame({"flow": record.inflow}, index=record.index)
+            summary = getVolumeWindowSummary(df, record.elev.idxmax(), durations)
+            compact.append(summary.reset_index().assign(scale_factor=scale_factor))
+            plotData = volumeWindowPlotData(df, summary)
+            windows = plotData.loc[plotData.metric != "flow"]
+            long.append(windows.assign(scale_factor=scale_factor))
+
+        path = str(tmp_path / "results.sqlite")
+        with ResultStore(path) as store:
+            # Compact and long layouts store the same rows, and upserts replace them
+            assert store.upsert("TERMINUS", 2023, pd.concat(long)) == 6
+            assert store.upsert("TERMINUS", 2023, pd.concat(compact)) == 6
+            store.upsert("TERMINUS", 2022, compact[1])
+            store.upsert("SUCCESS", 2023, compact[1])
+            assert len(store.query()) == 10
+
+        with ResultStore(path) as store:
+            threeDay = store.query("TERMINUS", duration=3)
+            assert list(threeDay.year) == [2022, 2023, 2023, 2023]
+            assert list(threeDay.loc[threeDay.year == 2023, "ratio"]) == [
+                c.set_index("duration").ratio[3] for c in compact
+            ]
+            one = store.query(
+                ["TERMINUS"], year=np.int64(2023), scale_factor=1.0, duration=1
+            )
+            row = compact[1].set_index("duration").loc[1]
+            assert len(one) == 1
+            assert one.window_start[0] == row.window_start
+            assert one.max_flow[0] == row.max_flow
+
+            store.delete("TERMINUS", 2023)
+            assert list(store.query().reservoir) == ["SUCCESS"] * 2 + ["TERMINUS"] * 2
+
+    def test_analysis_service_answers_jobs(self):
+        server = AnalysisServer(port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            client = AnalysisClient(server.url, timeout=30)
+            assert client.health()["status"] == "ok"
+
+            job = {
+                "dss_file": "data/Missing_Data.dss",
+                "year": 2023,
+                "ds_channel_capacity": 5500,
+                "pathFlowIn": "//TRM-TRM INFLOW-KAWEAH/FLOW//1HOUR/C:000010|A/",
+                "pathFlowOut": "//TRM-TRM OUTFLOW-KAWEAH/FLOW//1HOUR/C:000010|A/",
+                "pathElev": "//TERMINUS DAM-POOL/ELEV//1HOUR/C:000010|A/",
+                "window": ["01Dec2021 01:00", "10Dec2021 02:00"],
+                "scale_factor": 0.5,
+            }
+            with pytest.raises(RuntimeError, match="Cannot locate DSS file"):
+                client.run(job)
+            with pytest.raises(RuntimeError, match="Missing job fields: window"):
+                client.run({k: v for k, v in job.items() if k != "window"})
+            # Values of the wrong type are answered with 400, not a dropped connection
+            with pytest.raises(RuntimeError, match="window must be a list"):
+                client.run({**job, "window": 5})
+            with pytest.raises(RuntimeError, match="year must be an integer"):
+                client.run({**job, "year": "2023"})
+            for durations in [[1, "2"], [1.5], [True]]:
+                with pytest.raises(RuntimeError, match="durations must be a list of whole days"):
+                    client.run({**job, "durations": durations})
+            # Jobs may not pick output paths outside the server's directory
+            with pytest.raises(RuntimeError, match="outputDirectory must be a subdirectory"):
+                client.run({**job, "outputDirectory": "../elsewhere"})
+            with pytest.raises(RuntimeError, match="outputDirectory must be a subdirectory"):
+                client.run({**job, "outputDirectory": os.path.abspath("elsewhere")})
+            with pytest.raises(RuntimeError, match="reservoir must not contain path"):
+                client.run({**job, "reservoir": "../../TERMINUS"})
+            assert client.health()["jobs"] == 1
+
+            # Requests a web page could send are refused before the job is parsed
+            def post(headers):
+                request = urllib.request.Request(
+                    f"{server.url}/jobs", data=json.dumps(job).encode(), headers=headers
+                )
+                with pytest.raises(urllib.error.HTTPError) as error:
+                    urllib.request.urlopen(request, timeout=30)
+                return error.value.code
+
+            assert post({"Content-Type": "text/plain"}) == 415
+            json_headers = {"Content-Type": "application/json"}
+            assert post({**json_headers, "Origin": "https://example.com"}) == 403
+            assert post({**json_headers, "Host": "example.com:8750"}) == 403
+            assert post({**json_headers, "Origin": server.url}) == 422
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        # Result tables survive the JSON round trip
+        index = pd.date_range("2021-12-01 01:00", periods=24 * 4, freq="h")
+        df = pd.DataFrame({"flow": np.linspace(100, 900, len(index))}, index=index)
+        summary = getVolumeWindowSummary(df, index[60], [1, 2]).reset_index()
+        summary["scale_factor"] = 0.5
+        pd.testing.assert_frame_equal(_frameFromJson(_frameToJson(summary)), summary)
+
+    def test_duration_longer_than_record(self):
+        index = pd.date_range("2021-12-01 01:00", periods=30, freq="h")
+        df = pd.DataFrame({"flow": np.arange(30.0)}, index=index)
+
+        # 48 rows is between one and two record lengths; 168 is beyond both
+        for n_day in [2, 7]:
+            with pytest.raises(ValueError, match=f"too short for a {n_day}-day window"):
+                getVolumeWindowSummary(df, index[20], [n_day])
+
+    def test_batch_durations_longer_than_record(self):
+        index = pd.date_range("2021-12-01 01:00", periods=30, freq="h")
+        flow = np.vstack([np.arange(30.0), np.arange(30.0)[::-1]])
+
+        batch = batchVolumeWindowCalculations(flow, flow, index, [1, 2, 7])
+
+        assert not np.isnan(batch.ratios[:, 0]).any()
+        assert np.isnan(batch.ratios[:, 1:]).all()
+        assert np.isnan(batch.max_flow[:, 1:]).all()
+        assert np.isnat(batch.window_start[:, 1:]).all()
+        assert np.isnat(batch.window_end[:, 1:]).all()
+
+    def test_read_chunks_accepts_end_of_day_times(self, tmp_path):
+        dss_file = tmp_path / "record.dss"
+        dss_file.write_bytes(b"dss")
+        session = DssSession(str(dss_file))
+        windows = []
+        session.read = lambda path, variable, window: windows.append(window)
+
+        window = ("01Dec2021 01:00", "02Dec2021 24:00")
+        list(session.read_chunks("/A/B/FLOW//1HOUR/F/", "flow", window, "1D"))
+
+        assert windows == [
+            ("01Dec2021 01:00", "02Dec2021 00:59"),
+            ("02Dec2021 01:00", "03Dec2021 00:00"),
+        ]
+
+    def test_event_durations_longer_than_event_window(self):
+        record = syntheticHydrograph(24 * 120, seed=4, peak_flow=20000)
+        df = record.rename(columns={"inflow": "flow"})
+        events = detectEvents(df.elev)
+
+        # The default event window is 15 days (361 rows): 20 days is between one
+        # and two window lengths, 40 days beyond both
+        windows = eventVolumeWindows(df, events, 5500, [1, 20, 40])
+
+        assert windows.xs(1, level="duration").ratio.notna().all()
+        for n_day in [20, 40]:
+            longer = windows.xs(n_day, level="duration")
+            assert longer.ratio.isna().all()
+            assert longer.window_start.isna().all()